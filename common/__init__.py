@@ -0,0 +1,74 @@
+from .codec import ItemCodec
+from .compaction import CompactingSession
+from .consensus import Consensus, pick_consensus
+from .dir_cache import DirectoryCache, DirectoryEntry, directory_cache
+from .fan_out import Candidate, FanOutResult, fan_out
+from .file_index import SearchHit, TrigramIndex, search_index
+from .http import close_http_client, http_client
+from .io_pool import io_latency_stats, io_pool, run_io
+from .paged_reader import Page, read_page
+from .pruning import PruneStats, SessionPruner
+from .sandbox import SandboxPool, SandboxResult
+from .scripted_model import ScriptedModel
+from .single_flight import single_flight, single_flight_stats
+from .sqlite import PooledSQLiteSession, SQLitePool
+from .token_window import TokenWindowSession
+from .tokens import count_item_tokens, count_tokens
+from .ttl_cache import TTLCache
+from .weather import OPENWEATHER_URL, fetch_current_weather, weather_cache
+from .web_search import (
+    FakeSearchBackend,
+    SearchCache,
+    close_tavily_client,
+    compact_results,
+    search_web,
+    tavily_client,
+)
+from .write_behind import WriteBehindSession, WriteBehindStore
+
+__all__ = [
+    "Candidate",
+    "CompactingSession",
+    "Consensus",
+    "DirectoryCache",
+    "DirectoryEntry",
+    "FakeSearchBackend",
+    "FanOutResult",
+    "ItemCodec",
+    "OPENWEATHER_URL",
+    "Page",
+    "PooledSQLiteSession",
+    "PruneStats",
+    "SandboxPool",
+    "SandboxResult",
+    "ScriptedModel",
+    "SearchCache",
+    "SearchHit",
+    "SessionPruner",
+    "SQLitePool",
+    "TokenWindowSession",
+    "TrigramIndex",
+    "TTLCache",
+    "WriteBehindSession",
+    "WriteBehindStore",
+    "close_http_client",
+    "close_tavily_client",
+    "compact_results",
+    "count_item_tokens",
+    "count_tokens",
+    "directory_cache",
+    "fan_out",
+    "fetch_current_weather",
+    "http_client",
+    "io_latency_stats",
+    "io_pool",
+    "pick_consensus",
+    "read_page",
+    "run_io",
+    "search_index",
+    "search_web",
+    "single_flight",
+    "single_flight_stats",
+    "tavily_client",
+    "weather_cache",
+]
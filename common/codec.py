@@ -0,0 +1,159 @@
+import json
+import sqlite3
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Literal
+
+import orjson
+import zstandard
+
+from agents import TResponseInputItem
+
+COMPRESSION_LEVEL = 9
+DICTIONARY_SIZE = 16 * 1024
+
+StorageFormat = Literal["json", "zstd"]
+
+
+def read_only_uri(db_path: str | Path) -> str:
+    """A URI that opens `db_path` read-only and never creates it."""
+    return f"{Path(db_path).absolute().as_uri()}?mode=ro"
+
+
+class ItemCodec:
+    """
+    Encodes session items for the message_data column.
+
+    The "json" format writes the JSON text agents.SQLiteSession writes. The
+    "zstd" format writes compact JSON bytes (no spaces, UTF-8 instead of
+    \\u escapes), compressed with a zstd dictionary trained on the database's
+    own items, since a single item is too small to compress well on its own.
+    Dictionaries live in a `<messages>_dicts` table and each frame records
+    which one it used, so rows written with any dictionary, and legacy JSON
+    text rows, can always be read back.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        dictionaries_table: str,
+        storage_format: StorageFormat = "json",
+        level: int = COMPRESSION_LEVEL,
+    ):
+        self.db_path = db_path
+        self.dictionaries_table = dictionaries_table
+        self.storage_format = storage_format
+        self.level = level
+        self._dictionaries: dict[int, zstandard.ZstdCompressionDict] = {}
+        self.dictionary_id: int | None = None
+        self._local = threading.local()
+        self._load_dictionaries()
+
+    def encode(self, item: TResponseInputItem) -> str | bytes:
+        if self.storage_format == "json":
+            return json.dumps(item)
+
+        data = orjson.dumps(item)
+        if self.dictionary_id is None:
+            return data
+        compressed = self._compressor(self.dictionary_id).compress(data)
+        # Tiny items can grow, compact JSON bytes are readable as well
+        return compressed if len(compressed) < len(data) else data
+
+    def decode(self, data: str | bytes) -> TResponseInputItem:
+        """Decode any stored row, raising ValueError if it is not readable."""
+        if isinstance(data, bytes) and data.startswith(zstandard.FRAME_HEADER):
+            try:
+                dict_id = zstandard.get_frame_parameters(data).dict_id
+                data = self._decompressor(dict_id).decompress(data)
+            except zstandard.ZstdError as e:
+                raise ValueError(f"unreadable message data: {e}") from e
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # json.dumps writes NaN and Infinity, which orjson rejects
+            return json.loads(data)
+
+    def train(
+        self, samples: Iterable[TResponseInputItem], size: int = DICTIONARY_SIZE
+    ) -> int:
+        """
+        Train a dictionary on `samples`, store it and use it for new writes.
+        Returns its id.
+        """
+        dictionary = zstandard.train_dictionary(
+            size, [orjson.dumps(item) for item in samples], level=self.level
+        )
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                conn.execute(
+                    f"""
+                    CREATE TABLE IF NOT EXISTS {self.dictionaries_table} (
+                        id INTEGER PRIMARY KEY,
+                        data BLOB NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                    """
+                )
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.dictionaries_table} "
+                    "(id, data) VALUES (?, ?)",
+                    (dictionary.dict_id(), dictionary.as_bytes()),
+                )
+        finally:
+            conn.close()
+
+        self._dictionaries[dictionary.dict_id()] = dictionary
+        self.dictionary_id = dictionary.dict_id()
+        return dictionary.dict_id()
+
+    def _load_dictionaries(self) -> None:
+        # A separate connection, so rows can be decoded while a pooled one
+        # is borrowed
+        conn = sqlite3.connect(read_only_uri(self.db_path), uri=True)
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (self.dictionaries_table,),
+            ).fetchone()
+            rows = []
+            if exists:
+                rows = conn.execute(
+                    f"SELECT id, data FROM {self.dictionaries_table} "
+                    "ORDER BY created_at, rowid"
+                ).fetchall()
+        finally:
+            conn.close()
+
+        for dict_id, data in rows:
+            self._dictionaries[dict_id] = zstandard.ZstdCompressionDict(data)
+            self.dictionary_id = dict_id
+
+    def _dictionary(self, dict_id: int) -> zstandard.ZstdCompressionDict:
+        if dict_id not in self._dictionaries:
+            # Trained by another process since we started
+            self._load_dictionaries()
+        if dict_id not in self._dictionaries:
+            raise zstandard.ZstdError(f"unknown dictionary {dict_id}")
+        return self._dictionaries[dict_id]
+
+    def _compressor(self, dict_id: int) -> zstandard.ZstdCompressor:
+        # (De)compressors are not thread-safe, keep one per thread
+        compressors = self._local.__dict__.setdefault("compressors", {})
+        if dict_id not in compressors:
+            compressors[dict_id] = zstandard.ZstdCompressor(
+                level=self.level,
+                dict_data=self._dictionary(dict_id),
+                write_content_size=True,
+                write_checksum=False,
+            )
+        return compressors[dict_id]
+
+    def _decompressor(self, dict_id: int) -> zstandard.ZstdDecompressor:
+        decompressors = self._local.__dict__.setdefault("decompressors", {})
+        if dict_id not in decompressors:
+            dictionary = self._dictionary(dict_id) if dict_id else None
+            decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=dictionary)
+        return decompressors[dict_id]
@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+from agents import Agent, Runner, Session, TResponseInputItem
+
+from .tokens import count_item_tokens
+
+COMPACT_ABOVE_TOKENS = 3000
+KEEP_RECENT_TOKENS = 1000
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+summarizer = Agent(
+    name="Summarizer",
+    instructions="""
+    You summarize conversations between a user and an assistant so the
+    conversation can continue without the full history. Keep facts, names,
+    decisions, open questions and anything the user asked to remember.
+    Reply with the summary only.
+    """,
+)
+
+
+class CompactingSession:
+    """
+    Wraps a session and folds older turns into a single summary item once the
+    history grows past `compact_above_tokens`.
+
+    The newest `keep_recent_tokens` worth of turns are kept verbatim, everything
+    before them (including a previous summary) is summarized by `agent`. Call
+    schedule_compaction() after the reply is sent: the summary is produced in
+    a background task, and items added meanwhile are kept, since reads and
+    writes wait for the rewrite to finish. Sessions with replace_items()
+    (the pooled ones) rewrite the history in one transaction; others are
+    cleared and refilled, so a crash in between loses the history.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        agent: Agent = summarizer,
+        compact_above_tokens: int = COMPACT_ABOVE_TOKENS,
+        keep_recent_tokens: int = KEEP_RECENT_TOKENS,
+    ):
+        self.session = session
+        self.session_id = session.session_id
+        self.agent = agent
+        self.compact_above_tokens = compact_above_tokens
+        self.keep_recent_tokens = keep_recent_tokens
+        self.compactions = 0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def get_items(self, limit: int | None = None) -> list[TResponseInputItem]:
+        async with self._lock:
+            return await self.session.get_items(limit)
+
+    async def add_items(self, items: list[TResponseInputItem]) -> None:
+        async with self._lock:
+            await self.session.add_items(items)
+
+    async def pop_item(self) -> TResponseInputItem | None:
+        async with self._lock:
+            return await self.session.pop_item()
+
+    async def clear_session(self) -> None:
+        async with self._lock:
+            await self.session.clear_session()
+
+    def schedule_compaction(self) -> None:
+        """Compact in the background unless a compaction is already running."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.compact())
+
+    async def compact(self) -> bool:
+        """Summarize older turns if the history is over the threshold."""
+        try:
+            items = await self._history()
+            split = self._split_point(items)
+            if split is None:
+                return False
+
+            result = await Runner.run(self.agent, _transcript(items[:split]))
+            summary = {
+                "role": "system",
+                "content": SUMMARY_PREFIX + str(result.final_output),
+            }
+
+            async with self._lock:
+                # Items appended while summarizing are kept after the summary,
+                # if the history was changed in any other way we start over
+                current = await self._history()
+                if current[: len(items)] != items:
+                    return False
+                compacted = [summary, *current[split:]]
+                replace_items = getattr(self.session, "replace_items", None)
+                if replace_items is not None:
+                    await replace_items(compacted)
+                else:
+                    await self.session.clear_session()
+                    await self.session.add_items(compacted)
+
+            self.compactions += 1
+            return True
+        except Exception as e:
+            print(f"compaction of session {self.session_id} failed: {e!r}")
+            return False
+
+    async def _history(self) -> list[TResponseInputItem]:
+        # Windowed sessions only return part of the history from get_items()
+        get_all_items = getattr(self.session, "get_all_items", None)
+        if get_all_items is not None:
+            return await get_all_items()
+        return await self.session.get_items()
+
+    def _split_point(self, items: list[TResponseInputItem]) -> int | None:
+        """
+        Index of the first item to keep verbatim, always a user message, or
+        None if the history is small enough or has no such boundary.
+        """
+        sizes = [count_item_tokens(item) for item in items]
+        if sum(sizes) <= self.compact_above_tokens:
+            return None
+
+        recent = 0
+        split = len(items)
+        while split > 0 and recent + sizes[split - 1] <= self.keep_recent_tokens:
+            split -= 1
+            recent += sizes[split]
+
+        while split < len(items) and items[split].get("role") != "user":
+            split += 1
+
+        # Folding a lone previous summary would only rewrite it
+        if split >= len(items) or split < 2:
+            return None
+        return split
+
+
+def _transcript(items: list[TResponseInputItem]) -> str:
+    lines = []
+    for item in items:
+        if "role" in item:
+            content = item.get("content")
+            if isinstance(content, list):
+                content = " ".join(part.get("text", "") for part in content)
+            lines.append(f"{item['role']}: {content}")
+        elif item.get("type") == "function_call":
+            lines.append(f"tool call: {item['name']}({item['arguments']})")
+        elif item.get("type") == "function_call_output":
+            lines.append(f"tool output: {item['output']}")
+        else:
+            lines.append(json.dumps(item))
+    return "\n".join(lines)
@@ -0,0 +1,89 @@
+import math
+from collections import Counter
+from dataclasses import dataclass
+
+NGRAM_SIZE = 3
+# Mean similarity to the other candidates above which the medoid is trusted.
+# Rewordings of one translation score about 0.5-0.75, unrelated texts in the
+# same language 0.1-0.15
+AGREEMENT_THRESHOLD = 0.45
+
+
+@dataclass
+class Consensus:
+    # The candidate most similar to all the others (the medoid)
+    index: int
+    # Each candidate's mean cosine similarity to the others
+    scores: list[float]
+    similarities: list[list[float]]
+    threshold: float
+
+    @property
+    def agreement(self) -> float:
+        return self.scores[self.index]
+
+    @property
+    def agreed(self) -> bool:
+        """Whether the candidates agree enough to take the medoid."""
+        return self.agreement >= self.threshold
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> Counter[str]:
+    """Character n-grams of the lowercased text with whitespace collapsed."""
+    text = f" {' '.join(text.lower().split())} "
+    return Counter(text[i : i + n] for i in range(len(text) - n + 1))
+
+
+def tfidf_vectors(texts: list[str], n: int = NGRAM_SIZE) -> list[dict[str, float]]:
+    """
+    Sparse, L2-normalized TF-IDF vectors of the texts' character n-grams, with
+    sublinear term frequencies and smoothed IDF.
+    """
+    counts = [char_ngrams(text, n) for text in texts]
+    document_frequency = Counter(gram for count in counts for gram in count)
+    idf = {
+        gram: math.log((1 + len(texts)) / (1 + df)) + 1
+        for gram, df in document_frequency.items()
+    }
+
+    vectors = []
+    for count in counts:
+        vector = {gram: (1 + math.log(tf)) * idf[gram] for gram, tf in count.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors.append({gram: weight / norm for gram, weight in vector.items()})
+    return vectors
+
+
+def cosine(a: dict[str, float], b: dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(gram, 0.0) for gram, weight in a.items())
+
+
+def pick_consensus(
+    texts: list[str],
+    threshold: float = AGREEMENT_THRESHOLD,
+    n: int = NGRAM_SIZE,
+) -> Consensus:
+    """
+    Pick the consensus among candidate outputs without a model call: the
+    medoid, the candidate with the highest mean character n-gram TF-IDF
+    cosine similarity to the others. Check Consensus.agreed before trusting
+    it; when the candidates disagree a model should pick instead.
+    """
+    if not texts:
+        raise ValueError("no candidates to pick from")
+
+    vectors = tfidf_vectors(texts, n)
+    similarities = [[1.0] * len(texts) for _ in texts]
+    for i in range(len(texts)):
+        for j in range(i + 1, len(texts)):
+            similarities[i][j] = similarities[j][i] = cosine(vectors[i], vectors[j])
+
+    others = max(len(texts) - 1, 1)
+    scores = [
+        (sum(row) - 1.0) / others if len(texts) > 1 else 1.0 for row in similarities
+    ]
+    # Ties go to the earlier, i.e. faster, candidate
+    index = max(range(len(texts)), key=lambda i: (scores[i], -i))
+    return Consensus(index, scores, similarities, threshold)
@@ -0,0 +1,126 @@
+import os
+import stat
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+MAX_CACHED_DIRS = 4096
+# A listing taken this soon after the directory last changed may have missed
+# a change made within the same mtime tick, so it is not trusted. Generous
+# enough for filesystems with coarse timestamps
+RACY_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class DirectoryEntry:
+    name: str
+    path: str
+    is_dir: bool
+    is_file: bool
+    is_symlink: bool
+
+
+@dataclass
+class _Listing:
+    # (st_mtime_ns, st_ino) of the directory when it was scanned
+    version: tuple[int, int]
+    entries: list[DirectoryEntry]
+    racy: bool
+
+
+class DirectoryCache:
+    """
+    Directory listings from os.scandir, kept until the directory changes.
+
+    Creating, deleting or renaming an entry updates the directory's mtime, so
+    a lookup costs one stat of the directory instead of a scandir and a stat
+    per entry. On Linux scandir gets the entry types from the directory
+    itself, only symlinks need a stat to tell where they point; those are
+    counted in `stat_calls` too. A changed symlink target or a file's
+    contents don't touch the directory's mtime, the listing only records
+    names and types. Past `max_dirs` directories the least recently used
+    listing is dropped.
+    """
+
+    def __init__(self, max_dirs: int = MAX_CACHED_DIRS):
+        self.max_dirs = max_dirs
+        self.hits = 0
+        self.misses = 0
+        self.stat_calls = 0
+        self.scandir_calls = 0
+        self._listings: OrderedDict[str, _Listing] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def listdir(self, path: str | Path) -> list[DirectoryEntry]:
+        """
+        The entries of directory `path`, sorted by name. Raises
+        FileNotFoundError if it doesn't exist and NotADirectoryError if it
+        isn't a directory.
+        """
+        path = os.path.abspath(path)
+        info = os.stat(path)
+        if not stat.S_ISDIR(info.st_mode):
+            raise NotADirectoryError(path)
+        version = (info.st_mtime_ns, info.st_ino)
+
+        with self._lock:
+            self.stat_calls += 1
+            listing = self._listings.get(path)
+            if listing and listing.version == version and not listing.racy:
+                self._listings.move_to_end(path)
+                self.hits += 1
+                return listing.entries
+            self.misses += 1
+
+        scanned_at = time.time_ns()
+        entries, stat_calls = self._scan(path)
+        racy = scanned_at - info.st_mtime_ns < RACY_SECONDS * 1e9
+
+        with self._lock:
+            self.scandir_calls += 1
+            self.stat_calls += stat_calls
+            self._listings[path] = _Listing(version, entries, racy)
+            self._listings.move_to_end(path)
+            if len(self._listings) > self.max_dirs:
+                self._listings.popitem(last=False)
+        return entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._listings.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "directories": len(self._listings),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stat_calls": self.stat_calls,
+            "scandir_calls": self.scandir_calls,
+        }
+
+    @staticmethod
+    def _scan(path: str) -> tuple[list[DirectoryEntry], int]:
+        entries = []
+        stat_calls = 0
+        with os.scandir(path) as it:
+            for entry in it:
+                is_symlink = entry.is_symlink()
+                stat_calls += is_symlink
+                try:
+                    is_dir = entry.is_dir()
+                    is_file = entry.is_file()
+                except OSError:
+                    is_dir = is_file = False
+                entries.append(
+                    DirectoryEntry(entry.name, entry.path, is_dir, is_file, is_symlink)
+                )
+        entries.sort(key=lambda entry: entry.name)
+        return entries, stat_calls
+
+
+# Shared by every tool and run in the process
+directory_cache = DirectoryCache()
@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Literal
+
+Status = Literal["ok", "error", "timeout", "cancelled"]
+
+
+@dataclass
+class Candidate[T]:
+    index: int
+    status: Status = "cancelled"
+    value: T | None = None
+    error: str | None = None
+    # Time from the candidate's start to its end, 0 if it never started
+    seconds: float = 0.0
+
+
+@dataclass
+class FanOutResult[T]:
+    candidates: list[Candidate[T]]
+    # Indexes of the successful candidates in the order they finished
+    finished: list[int] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def values(self) -> list[T]:
+        """Successful values, fastest first."""
+        return [self.candidates[i].value for i in self.finished]
+
+    def latency_report(self) -> str:
+        lines = [
+            f"candidate {c.index}: {c.status:9} {c.seconds * 1000:8.1f}ms"
+            + (f"  {c.error}" if c.error else "")
+            for c in self.candidates
+        ]
+        lines.append(f"total: {self.seconds * 1000:.1f}ms")
+        return "\n".join(lines)
+
+
+async def fan_out[T](
+    candidate: Callable[[int], Awaitable[T]],
+    n: int,
+    quorum: int | None = None,
+    concurrency: int | None = None,
+    timeout: float | None = None,
+) -> FanOutResult[T]:
+    """
+    Run `candidate(i)` for i in range(n) concurrently and return once `quorum`
+    of them succeeded (all n by default), cancelling the rest.
+
+    At most `concurrency` candidates run at a time, the others wait for a
+    slot. Each gets `timeout` seconds once it starts. Candidates that fail or
+    time out don't count towards the quorum; if too many do, the result has
+    fewer values than the quorum. Every candidate's status and latency is in
+    the result, so quality can be traded against tail latency.
+    """
+    quorum = min(quorum or n, n)
+    semaphore = asyncio.Semaphore(concurrency or n)
+    candidates = [Candidate[T](i) for i in range(n)]
+    result = FanOutResult(candidates)
+
+    async def run(c: Candidate[T]) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                async with asyncio.timeout(timeout):
+                    c.value = await candidate(c.index)
+                c.status = "ok"
+            except TimeoutError:
+                c.status = "timeout"
+            except asyncio.CancelledError:
+                c.status = "cancelled"
+                raise
+            except Exception as e:
+                c.status = "error"
+                c.error = repr(e)
+            finally:
+                c.seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tasks = {asyncio.create_task(run(c)): c for c in candidates}
+    pending = set(tasks)
+    try:
+        while pending and len(result.finished) < quorum:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            # Several can finish in the same step, record them fastest first
+            for task in sorted(done, key=lambda task: tasks[task].seconds):
+                if tasks[task].status == "ok":
+                    result.finished.append(tasks[task].index)
+    finally:
+        # Stragglers, including those still waiting for a slot
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    result.seconds = time.perf_counter() - started
+    return result
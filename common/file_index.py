@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from .dir_cache import directory_cache
+
+MAX_FILE_BYTES = 1024 * 1024
+# Files indexed per root, the rest of a bigger tree is left out
+MAX_INDEXED_FILES = 20_000
+# Roots whose index is kept, past that the least recently used is dropped
+MAX_INDEXES = 8
+MAX_HITS = 20
+MAX_LINE_CHARS = 200
+SKIP_DIRS = {".git", ".venv", "venv", "__pycache__", "node_modules", ".ruff_cache"}
+
+
+@dataclass
+class _IndexedFile:
+    # (mtime_ns, size) when indexed
+    version: tuple[int, int]
+    trigrams: frozenset[str]
+
+
+@dataclass
+class SearchHit:
+    path: str
+    line_number: int
+    line: str
+    score: int
+
+    def __str__(self) -> str:
+        line = self.line.strip()
+        if len(line) > MAX_LINE_CHARS:
+            line = line[:MAX_LINE_CHARS] + "…"
+        return f"{self.path}:{self.line_number}: {line}"
+
+
+@dataclass
+class RefreshStats:
+    files: int
+    indexed: int
+    removed: int
+    seconds: float
+    # Whether the tree had more than max_files files
+    truncated: bool = False
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def _read_text(path: str) -> str | None:
+    """The file's text, or None for binary files."""
+    with open(path, "rb") as f:
+        data = f.read(MAX_FILE_BYTES)
+    if b"\0" in data[:8192]:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+class TrigramIndex:
+    """
+    A case-insensitive trigram index of the text files under `root`.
+
+    Each file maps to the set of three-character substrings of its lowercased
+    text, and each trigram to the files that contain it, so a search only
+    reads the files that contain every trigram of a search term. refresh()
+    walks the tree and re-indexes only files whose mtime or size changed, so
+    keeping the index current costs a stat per file rather than a read.
+    Hidden directories, SKIP_DIRS, binary files and files over
+    `max_file_bytes` are left out, and only the first `max_files` files the
+    walk finds are indexed.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        max_file_bytes: int = MAX_FILE_BYTES,
+        max_files: int = MAX_INDEXED_FILES,
+    ):
+        self.root = Path(root).resolve()
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self._files: dict[str, _IndexedFile] = {}
+        self._postings: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> RefreshStats:
+        started = time.perf_counter()
+        with self._lock:
+            seen = set()
+            indexed = 0
+            truncated = False
+            for path, stat in self._walk(self.root):
+                if len(seen) >= self.max_files:
+                    truncated = True
+                    break
+                seen.add(path)
+                entry = self._files.get(path)
+                if entry and entry.version == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                self._index_file(path, stat)
+                indexed += 1
+
+            removed = self._files.keys() - seen
+            for path in removed:
+                self._remove(path)
+
+        return RefreshStats(
+            len(self._files),
+            indexed,
+            len(removed),
+            time.perf_counter() - started,
+            truncated,
+        )
+
+    def search(self, query: str, max_hits: int = MAX_HITS) -> list[SearchHit]:
+        """
+        Lines containing the query, best first: lines with the whole query
+        rank above lines with only some of its words.
+        """
+        phrase = query.lower().strip()
+        terms = phrase.split()
+        if not terms:
+            return []
+
+        # Words too short to have trigrams only add to the score of lines
+        # found through the longer ones
+        with self._lock:
+            candidates = self._candidates(phrase)
+            for term in terms:
+                if len(term) >= 3:
+                    candidates |= self._candidates(term)
+
+        hits = []
+        for path in candidates:
+            try:
+                text = _read_text(path)
+            except OSError:
+                continue
+            if text is None:
+                continue
+
+            relative = os.path.relpath(path, self.root)
+            name_bonus = any(term in Path(path).name.lower() for term in terms)
+            for line_number, line in enumerate(text.splitlines(), start=1):
+                lowered = line.lower()
+                if phrase in lowered:
+                    score = 2 * len(terms)
+                else:
+                    score = sum(term in lowered for term in terms)
+                if score:
+                    hits.append(
+                        SearchHit(relative, line_number, line, score + name_bonus)
+                    )
+
+        hits.sort(key=lambda hit: (-hit.score, hit.path, hit.line_number))
+        return hits[:max_hits]
+
+    def _candidates(self, term: str) -> set[str]:
+        # Shorter terms have no trigrams to look up
+        if len(term) < 3:
+            return set(self._files)
+
+        result = None
+        for trigram in _trigrams(term):
+            files = self._postings.get(trigram, set())
+            result = set(files) if result is None else result & files
+            if not result:
+                return set()
+        return result
+
+    def _walk(self, directory: str | Path):
+        # Unchanged directories are not scanned again, only their files stated
+        try:
+            entries = directory_cache.listdir(directory)
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir and not entry.is_symlink:
+                if entry.name not in SKIP_DIRS:
+                    yield from self._walk(entry.path)
+            elif entry.is_file:
+                try:
+                    stat = os.stat(entry.path)
+                except OSError:
+                    continue
+                if stat.st_size <= self.max_file_bytes:
+                    yield entry.path, stat
+
+    def _index_file(self, path: str, stat: os.stat_result) -> None:
+        self._remove(path)
+        try:
+            text = _read_text(path)
+        except OSError:
+            return
+        # Binary files are remembered without trigrams, so they are not read
+        # again until they change
+        trigrams = frozenset(_trigrams(text.lower()) if text is not None else ())
+
+        version = (stat.st_mtime_ns, stat.st_size)
+        self._files[path] = _IndexedFile(version, trigrams)
+        for trigram in trigrams:
+            self._postings.setdefault(trigram, set()).add(path)
+
+    def _remove(self, path: str) -> None:
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        for trigram in entry.trigrams:
+            files = self._postings.get(trigram)
+            if files is not None:
+                files.discard(path)
+                if not files:
+                    del self._postings[trigram]
+
+
+_indexes: OrderedDict[Path, TrigramIndex] = OrderedDict()
+
+
+def search_index(root: str | Path) -> TrigramIndex:
+    """
+    The shared index of `root`, created on first use. Only the MAX_INDEXES
+    most recently used roots keep their index.
+    """
+    root = Path(root).resolve()
+    if root in _indexes:
+        _indexes.move_to_end(root)
+    else:
+        _indexes[root] = TrigramIndex(root)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return _indexes[root]
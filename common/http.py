@@ -0,0 +1,44 @@
+import asyncio
+
+import httpx
+
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 30.0
+TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+_client: httpx.AsyncClient | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+
+
+def http_client() -> httpx.AsyncClient:
+    """
+    The process-wide async HTTP client for tools.
+
+    Connections are kept alive and reused across calls, so repeated requests
+    to the same API skip the TCP and TLS handshakes. httpx clients belong to
+    the event loop they were first used on, so a new one is made for a new
+    loop (each asyncio.run()).
+    """
+    global _client, _loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _loop is not loop:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=TIMEOUT,
+        )
+        _loop = loop
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client, _loop
+
+    if _client is not None:
+        await _client.aclose()
+    _client = _loop = None
@@ -0,0 +1,81 @@
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+# Disk I/O doesn't get faster with many more threads, and a bound keeps a
+# bulk call from starving the default executor other libraries use
+IO_WORKERS = 8
+LATENCY_SAMPLES = 1024
+
+
+@dataclass
+class LatencyStats:
+    calls: int = 0
+    errors: int = 0
+    samples: deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    def record(self, seconds: float, error: bool = False) -> None:
+        self.calls += 1
+        self.errors += error
+        self.samples.append(seconds)
+
+    def as_dict(self) -> dict:
+        samples = sorted(self.samples)
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return round(
+                samples[min(int(p * len(samples)), len(samples) - 1)] * 1000, 2
+            )
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+        }
+
+
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+_stats: dict[str, LatencyStats] = {}
+
+
+def io_pool() -> ThreadPoolExecutor:
+    """The process-wide thread pool for blocking file system calls."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(IO_WORKERS, thread_name_prefix="io")
+        return _pool
+
+
+def io_latency_stats() -> dict[str, dict]:
+    """Calls, errors and latency percentiles per name passed to run_io."""
+    return {name: stats.as_dict() for name, stats in _stats.items()}
+
+
+async def run_io[T](name: str, func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run blocking `func(*args, **kwargs)` on the I/O pool and record how long
+    it took, queueing included, under `name`.
+    """
+    loop = asyncio.get_running_loop()
+    stats = _stats.setdefault(name, LatencyStats())
+    started = time.perf_counter()
+    try:
+        result = await loop.run_in_executor(
+            io_pool(), functools.partial(func, *args, **kwargs)
+        )
+    except Exception:
+        stats.record(time.perf_counter() - started, error=True)
+        raise
+    stats.record(time.perf_counter() - started)
+    return result
@@ -0,0 +1,150 @@
+"""
+Re-encode the items stored in a session database, in place.
+
+    python -m common.migrate bot.sql                # compact zstd format
+    python -m common.migrate bot.sql --format json  # back to JSON text
+
+Converting to zstd first trains a dictionary on a sample of the stored items
+(unless the database already has one, see --retrain). Rows are rewritten in
+batches of short transactions, so a running bot only waits for one batch at a
+time; rows it writes meanwhile in the old format stay readable and are picked
+up by the next run. Pass --vacuum to give the freed pages back to the disk.
+"""
+
+import argparse
+import time
+
+import zstandard
+
+from .codec import DICTIONARY_SIZE
+from .sqlite import SQLitePool
+from .tokens import count_item_tokens
+
+BATCH_SIZE = 500
+SAMPLE_SIZE = 5000
+
+
+def stored_bytes(pool: SQLitePool) -> tuple[int, int]:
+    with pool.connection() as conn:
+        rows, size = conn.execute(
+            f"SELECT count(*), sum(length(message_data)) FROM {pool.messages_table}"
+        ).fetchone()
+    return rows, size or 0
+
+
+def train(pool: SQLitePool, samples: int, size: int) -> int | None:
+    with pool.connection() as conn:
+        rows = conn.execute(
+            f"SELECT message_data FROM {pool.messages_table} ORDER BY id DESC LIMIT ?",
+            (samples,),
+        ).fetchall()
+
+    items = []
+    for (message_data,) in rows:
+        try:
+            items.append(pool.codec.decode(message_data))
+        except ValueError:
+            continue
+    try:
+        return pool.codec.train(items, size)
+    except zstandard.ZstdError:
+        # Too few items to learn from, they are still stored as compact JSON
+        return None
+
+
+def migrate(pool: SQLitePool, batch_size: int, reencode: bool) -> int:
+    """
+    Rewrite rows that are not in the pool's format or have no token count,
+    returns how many. The counts are stored along, since a compressed row's
+    size can't be used to estimate them.
+    """
+    codec = pool.codec
+    target = str if codec.storage_format == "json" else bytes
+    pool.ensure_column(pool.messages_table, "token_count", "INTEGER")
+    last_id = rewritten = 0
+
+    while True:
+        with pool.connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT id, message_data, token_count FROM {pool.messages_table}
+                WHERE id > ? ORDER BY id LIMIT ?
+                """,
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                return rewritten
+
+            updates = []
+            for row_id, message_data, tokens in rows:
+                current = isinstance(message_data, target) and not reencode
+                if current and tokens is not None:
+                    continue
+                try:
+                    item = codec.decode(message_data)
+                except ValueError:
+                    continue
+                if not current:
+                    message_data = codec.encode(item)
+                updates.append((message_data, count_item_tokens(item), row_id))
+
+            conn.executemany(
+                f"""
+                UPDATE {pool.messages_table} SET message_data = ?, token_count = ?
+                WHERE id = ?
+                """,
+                updates,
+            )
+        rewritten += len(updates)
+        last_id = rows[-1][0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("db_path")
+    parser.add_argument("--format", choices=["zstd", "json"], default="zstd")
+    parser.add_argument("--messages-table", default="agent_messages")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--samples", type=int, default=SAMPLE_SIZE)
+    parser.add_argument("--dictionary-size", type=int, default=DICTIONARY_SIZE)
+    parser.add_argument(
+        "--retrain",
+        action="store_true",
+        help="train a new dictionary and re-encode rows that are already zstd",
+    )
+    parser.add_argument("--vacuum", action="store_true")
+    args = parser.parse_args()
+
+    pool = SQLitePool(
+        args.db_path,
+        messages_table=args.messages_table,
+        storage_format=args.format,
+    )
+    started = time.perf_counter()
+    rows, size_before = stored_bytes(pool)
+
+    if args.format == "zstd" and (args.retrain or pool.codec.dictionary_id is None):
+        dict_id = train(pool, args.samples, args.dictionary_size)
+        if dict_id is None:
+            print("not enough items to train a dictionary, storing compact JSON")
+        else:
+            print(f"trained dictionary {dict_id}")
+
+    rewritten = migrate(pool, args.batch_size, args.retrain)
+    _, size_after = stored_bytes(pool)
+
+    if args.vacuum:
+        with pool.connection() as conn:
+            conn.execute("VACUUM")
+    pool.close()
+
+    print(f"rewrote {rewritten} of {rows} rows in {time.perf_counter() - started:.1f}s")
+    if rows:
+        print(
+            f"message_data: {size_before} -> {size_after} bytes "
+            f"({size_before / rows:.0f} -> {size_after / rows:.0f} bytes per item)"
+        )
+
+
+if __name__ == "__main__":
+    main()
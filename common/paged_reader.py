@@ -0,0 +1,181 @@
+import bisect
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+PAGE_BYTES = 16 * 1024
+PAGE_LINES = 200
+CHUNK_BYTES = 1024 * 1024
+# Up to this size the whole line index is built, so pages show the total
+FULL_INDEX_BYTES = 16 * CHUNK_BYTES
+MAX_CACHED_INDEXES = 64
+
+
+@dataclass
+class Page:
+    path: str
+    text: str
+    start_byte: int
+    end_byte: int
+    total_bytes: int
+    start_line: int
+    end_line: int
+    total_lines: int | None
+
+    @property
+    def is_last(self) -> bool:
+        return self.end_byte >= self.total_bytes
+
+    def __str__(self) -> str:
+        total_lines = "?" if self.total_lines is None else self.total_lines
+        header = (
+            f"file {self.path}, bytes {self.start_byte}-{self.end_byte} "
+            f"of {self.total_bytes}, lines {self.start_line}-{self.end_line} "
+            f"of {total_lines}:"
+        )
+        footer = (
+            "(end of file)"
+            if self.is_last
+            else f"(more: read again with offset={self.end_byte})"
+        )
+        return f"{header}\n\n{self.text}\n{footer}"
+
+
+class _LineIndex:
+    """
+    Cumulative newline counts at the end of each CHUNK_BYTES chunk of a file,
+    extended only as far as a lookup needs. Turns byte offsets into line
+    numbers and back without reading the file from the start every time.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.chunk_lines: list[int] = []
+        self.lock = threading.Lock()
+
+    @property
+    def complete(self) -> bool:
+        return len(self.chunk_lines) * CHUNK_BYTES >= self.size
+
+    def total_lines(self, mm: mmap.mmap) -> int | None:
+        if not self.complete:
+            return None
+        # A last line without a trailing newline still counts
+        newlines = self.chunk_lines[-1] if self.chunk_lines else 0
+        return newlines + (mm[self.size - 1] != ord("\n"))
+
+    def extend(self, mm: mmap.mmap, chunks: int) -> None:
+        while len(self.chunk_lines) < chunks and not self.complete:
+            start = len(self.chunk_lines) * CHUNK_BYTES
+            lines = mm[start : start + CHUNK_BYTES].count(b"\n")
+            before = self.chunk_lines[-1] if self.chunk_lines else 0
+            self.chunk_lines.append(before + lines)
+
+    def line_at(self, mm: mmap.mmap, offset: int) -> int:
+        """The 1-based line number of the byte at `offset`."""
+        chunk = offset // CHUNK_BYTES
+        self.extend(mm, chunk)
+        before = self.chunk_lines[chunk - 1] if chunk else 0
+        return before + mm[chunk * CHUNK_BYTES : offset].count(b"\n") + 1
+
+    def line_start(self, mm: mmap.mmap, line: int) -> int | None:
+        """Byte offset where 1-based `line` starts, None past the last line."""
+        newlines = line - 1
+        if newlines <= 0:
+            return 0
+        while not self.complete and (
+            not self.chunk_lines or self.chunk_lines[-1] < newlines
+        ):
+            self.extend(mm, len(self.chunk_lines) + 1)
+
+        chunk = bisect.bisect_left(self.chunk_lines, newlines)
+        if chunk == len(self.chunk_lines):
+            return None
+        position = chunk * CHUNK_BYTES
+        remaining = newlines - (self.chunk_lines[chunk - 1] if chunk else 0)
+        for _ in range(remaining):
+            position = mm.find(b"\n", position) + 1
+        return position
+
+
+_indexes: OrderedDict[tuple[str, int, int], _LineIndex] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def _line_index(path: str, stat: os.stat_result) -> _LineIndex:
+    # A changed file gets a new key, the stale index ages out of the cache
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = _LineIndex(stat.st_size)
+            if len(_indexes) > MAX_CACHED_INDEXES:
+                _indexes.popitem(last=False)
+        _indexes.move_to_end(key)
+    return index
+
+
+def read_page(
+    path: str | Path,
+    offset: int = 0,
+    line: int | None = None,
+    max_bytes: int = PAGE_BYTES,
+    max_lines: int = PAGE_LINES,
+) -> Page:
+    """
+    Read a window of a text file, starting at byte `offset` or, if given, at
+    the start of `line` (1-based).
+
+    The file is memory-mapped, so only the pages that are read are loaded,
+    whatever the file size. A window ends after `max_lines` lines or before
+    `max_bytes` bytes, at a line break when possible; a longer line is cut
+    and continues on the next page. Page.end_byte is the offset to continue
+    from.
+    """
+    path = str(path)
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        size = stat.st_size
+        if size == 0:
+            return Page(path, "", 0, 0, 0, 1, 1, 1)
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            index = _line_index(path, stat)
+            with index.lock:
+                if size <= FULL_INDEX_BYTES:
+                    index.extend(mm, -(-size // CHUNK_BYTES))
+                if line is not None:
+                    start = index.line_start(mm, line)
+                    if start is None:
+                        start = size
+                else:
+                    start = min(max(offset, 0), size)
+                    # Don't start in the middle of a UTF-8 character
+                    while start < size and mm[start] & 0xC0 == 0x80:
+                        start += 1
+
+                limit = min(start + max_bytes, size)
+                end = start
+                lines = 0
+                while end < limit and lines < max_lines:
+                    newline = mm.find(b"\n", end, limit)
+                    if newline == -1:
+                        if limit == size or lines == 0:
+                            end = limit
+                        # A cut line continues at a character boundary
+                        while start + 1 < end < size and mm[end] & 0xC0 == 0x80:
+                            end -= 1
+                        break
+                    end = newline + 1
+                    lines += 1
+
+                start_line = index.line_at(mm, start)
+                end_line = index.line_at(mm, max(end - 1, start))
+                total_lines = index.total_lines(mm)
+
+            text = mm[start:end].decode("utf-8", errors="replace")
+
+    return Page(path, text, start, end, size, start_line, end_line, total_lines)
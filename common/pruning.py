@@ -0,0 +1,134 @@
+import asyncio
+import time
+from dataclasses import dataclass
+
+from .sqlite import SQLitePool
+
+BATCH_SIZE = 100
+
+
+@dataclass
+class PruneStats:
+    sessions: int
+    rows_deleted: int
+    seconds: float
+
+
+class SessionPruner:
+    """
+    Keeps only the last `keep_last_n` messages of every session, touching only
+    sessions that were written to since the previous pass.
+
+    An insert trigger on the messages table records the session id in a
+    dirty-sessions table, so writes from any connection are tracked and the
+    set survives restarts. Each pass drains that table in batches of
+    `batch_size` sessions, one short write transaction per batch, on a worker
+    thread so the event loop is never blocked.
+    """
+
+    def __init__(
+        self, pool: SQLitePool, keep_last_n: int, batch_size: int = BATCH_SIZE
+    ):
+        self.pool = pool
+        self.keep_last_n = keep_last_n
+        self.batch_size = batch_size
+        self.dirty_table = f"{pool.messages_table}_dirty"
+        self._setup()
+
+    def _setup(self) -> None:
+        messages = self.pool.messages_table
+        trigger = f"{messages}_mark_dirty"
+
+        with self.pool.connection() as conn:
+            conn.execute(
+                f"""
+                CREATE INDEX IF NOT EXISTS idx_{messages}_session_time
+                ON {messages}(session_id, created_at, id)
+                """
+            )
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.dirty_table} (
+                    session_id TEXT PRIMARY KEY
+                ) WITHOUT ROWID
+                """
+            )
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                (trigger,),
+            ).fetchone()
+            if exists:
+                return
+
+            conn.execute(
+                f"""
+                CREATE TRIGGER {trigger} AFTER INSERT ON {messages}
+                BEGIN
+                    INSERT OR IGNORE INTO {self.dirty_table} (session_id)
+                    VALUES (NEW.session_id);
+                END
+                """
+            )
+            # History written before tracking existed has to be checked once
+            conn.execute(
+                f"""
+                INSERT OR IGNORE INTO {self.dirty_table} (session_id)
+                SELECT DISTINCT session_id FROM {messages}
+                """
+            )
+
+    def _prune_batch(self) -> tuple[int, int]:
+        messages = self.pool.messages_table
+
+        with self.pool.connection() as conn:
+            session_ids = [
+                row[0]
+                for row in conn.execute(
+                    f"SELECT session_id FROM {self.dirty_table} LIMIT ?",
+                    (self.batch_size,),
+                )
+            ]
+
+            rows_deleted = 0
+            for session_id in session_ids:
+                cursor = conn.execute(
+                    f"""
+                    DELETE FROM {messages}
+                    WHERE session_id = ?
+                      AND id NOT IN (
+                        SELECT id FROM {messages}
+                        WHERE session_id = ?
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT ?
+                      )
+                    """,
+                    (session_id, session_id, self.keep_last_n),
+                )
+                rows_deleted += cursor.rowcount
+
+            conn.executemany(
+                f"DELETE FROM {self.dirty_table} WHERE session_id = ?",
+                [(session_id,) for session_id in session_ids],
+            )
+
+        return len(session_ids), rows_deleted
+
+    def _prune_sync(self) -> PruneStats:
+        started = time.perf_counter()
+        sessions = rows_deleted = 0
+
+        while True:
+            batch_sessions, batch_rows = self._prune_batch()
+            sessions += batch_sessions
+            rows_deleted += batch_rows
+            if batch_sessions < self.batch_size:
+                break
+
+        if rows_deleted:
+            with self.pool.connection() as conn:
+                conn.execute("PRAGMA optimize")
+
+        return PruneStats(sessions, rows_deleted, time.perf_counter() - started)
+
+    async def run_pass(self) -> PruneStats:
+        return await asyncio.to_thread(self._prune_sync)
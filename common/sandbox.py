@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import secrets
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+WORKER_PATH = Path(__file__).with_name("sandbox_worker.py")
+MAX_JOBS_PER_WORKER = 100
+CPU_SECONDS = 2.0
+WALL_SECONDS = 5.0
+MEMORY_BYTES = 512 * 1024 * 1024
+FILE_SIZE_BYTES = 16 * 1024 * 1024
+MAX_OUTPUT_CHARS = 4000
+READ_LIMIT = 1024 * 1024
+# The worker enforces the wall-clock limit, this is for a worker that hangs
+REPLY_GRACE_SECONDS = 1.0
+
+
+@dataclass
+class SandboxResult:
+    ok: bool
+    result: str | None
+    output: str
+    error: str | None
+    seconds: float
+
+    def __str__(self) -> str:
+        parts = [self.output.rstrip()] if self.output.strip() else []
+        if self.error is not None:
+            parts.append(f"error: {self.error}")
+        elif self.result is not None:
+            parts.append(f"result = {self.result}")
+        return "\n".join(parts) or "(no result and no output)"
+
+
+class _Worker:
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.jobs = 0
+
+    def kill(self) -> None:
+        if self.process.returncode is None:
+            self.process.kill()
+        self.process.stdin.close()
+
+
+class SandboxPool:
+    """
+    A pool of warm Python worker processes for running untrusted snippets.
+
+    Each worker runs `python -I` with an empty environment in a private
+    working directory and moves into its own user and network namespace
+    where the kernel allows it, so it has no network. It runs every job in a
+    forked child with its own result pipe, so a snippet can't see other jobs
+    or answer for them, and nothing it changes outlives the job. The child
+    limits its address space and file sizes, gets `cpu_seconds` of CPU time
+    (enforced by the kernel) and can't start processes or threads
+    (RLIMIT_NPROC 0). An audit hook blocks sockets, ctypes and changing
+    resource limits, and refuses writes outside the working directory.
+    After `wall_seconds` the child is killed. Workers are replaced after
+    `max_jobs` jobs or when one misbehaves; replacements start in the
+    background.
+
+    This is defence in depth for a single machine, not a security boundary
+    against a determined attacker. Snippets can read any file the process
+    can. Writes outside the working directory are refused by the audit
+    hook, which native code could get around, not by the kernel. A pool
+    started as root runs its workers as nobody, since the kernel doesn't
+    apply RLIMIT_NPROC to root; they import the standard library through
+    directories opened before the switch, so all of it stays importable.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        max_jobs: int = MAX_JOBS_PER_WORKER,
+        cpu_seconds: float = CPU_SECONDS,
+        wall_seconds: float = WALL_SECONDS,
+        memory_bytes: int = MEMORY_BYTES,
+        file_size_bytes: int = FILE_SIZE_BYTES,
+        max_output_chars: int = MAX_OUTPUT_CHARS,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.cpu_seconds = cpu_seconds
+        self.wall_seconds = wall_seconds
+        self.jobs = 0
+        self.recycled = 0
+        self.killed = 0
+        self.network_namespace: bool | None = None
+        self._config = json.dumps(
+            {
+                "max_jobs": max_jobs,
+                "cpu_seconds": cpu_seconds,
+                "memory_bytes": memory_bytes,
+                "file_size_bytes": file_size_bytes,
+                "max_output_chars": max_output_chars,
+            }
+        )
+        self._idle: asyncio.Queue[_Worker] | None = None
+        self._all: set[_Worker] = set()
+        self._replacements: set[asyncio.Task] = set()
+        self._workdir: str | None = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Start the workers. run() does it on first use otherwise."""
+        async with self._start_lock:
+            if self._idle is not None:
+                return
+            self._workdir = tempfile.mkdtemp(prefix="sandbox-")
+            self._idle = asyncio.Queue()
+            workers = await asyncio.gather(
+                *(self._spawn() for _ in range(self.workers))
+            )
+            for worker in workers:
+                self._idle.put_nowait(worker)
+
+    async def run(self, code: str, cpu_seconds: float | None = None) -> SandboxResult:
+        """Run `code` in a worker, its `result` variable is the result."""
+        await self.start()
+        worker = await self._idle.get()
+        started = time.perf_counter()
+        cpu_seconds = cpu_seconds or self.cpu_seconds
+        self.jobs += 1
+        worker.jobs += 1
+
+        retire = worker.jobs >= self.max_jobs
+        job_id = secrets.token_hex(16)
+        try:
+            job = {
+                "id": job_id,
+                "code": code,
+                "cpu_seconds": cpu_seconds,
+                "wall_seconds": self.wall_seconds,
+            }
+            worker.process.stdin.write(json.dumps(job).encode() + b"\n")
+            await worker.process.stdin.drain()
+            line = await asyncio.wait_for(
+                worker.process.stdout.readline(),
+                self.wall_seconds + REPLY_GRACE_SECONDS,
+            )
+            if not line:
+                raise ConnectionError
+            message = json.loads(line)
+            # Anything else means the worker's pipe can't be trusted anymore
+            if message.get("id") != job_id:
+                raise ValueError("reply for another job")
+            result = SandboxResult(
+                message["ok"],
+                message["result"],
+                message["output"],
+                message["error"],
+                time.perf_counter() - started,
+            )
+        except (TimeoutError, ConnectionError, ValueError, OSError):
+            retire = True
+            self.killed += 1
+            worker.kill()
+            returncode = await worker.process.wait()
+            result = SandboxResult(
+                False,
+                None,
+                "",
+                self._killed_reason(returncode),
+                time.perf_counter() - started,
+            )
+        except BaseException:
+            # Cancelled mid-job, the worker's state is unknown
+            retire = True
+            raise
+        finally:
+            if retire:
+                self._retire(worker)
+            else:
+                self._idle.put_nowait(worker)
+        return result
+
+    async def close(self) -> None:
+        for task in self._replacements:
+            task.cancel()
+        await asyncio.gather(*self._replacements, return_exceptions=True)
+        for worker in self._all:
+            worker.kill()
+            await worker.process.wait()
+        self._all.clear()
+        self._idle = None
+        if self._workdir is not None:
+            shutil.rmtree(self._workdir, ignore_errors=True)
+            self._workdir = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "jobs": self.jobs,
+            "recycled": self.recycled,
+            "killed": self.killed,
+            "network_namespace": self.network_namespace,
+        }
+
+    def _killed_reason(self, returncode: int | None) -> str:
+        if returncode == -signal.SIGKILL:
+            return "sandbox worker stopped answering and was killed"
+        return f"sandbox worker failed with exit code {returncode}"
+
+    async def _spawn(self) -> _Worker:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-I",
+            str(WORKER_PATH),
+            self._config,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            cwd=self._workdir,
+            # Nothing from our environment, API keys included
+            env={},
+            limit=READ_LIMIT,
+        )
+        worker = _Worker(process)
+        try:
+            ready = json.loads(await process.stdout.readline())
+        except BaseException:
+            worker.kill()
+            await process.wait()
+            raise
+        self.network_namespace = ready["network_namespace"]
+        self._all.add(worker)
+        return worker
+
+    def _retire(self, worker: _Worker) -> None:
+        self.recycled += 1
+        worker.kill()
+        self._all.discard(worker)
+
+        async def replace() -> None:
+            await worker.process.wait()
+            self._idle.put_nowait(await self._spawn())
+
+        task = asyncio.create_task(replace())
+        self._replacements.add(task)
+        task.add_done_callback(self._replacements.discard)
@@ -0,0 +1,300 @@
+"""
+Worker process of common.sandbox.SandboxPool, started as
+
+    python -I sandbox_worker.py '{"memory_bytes": ..., ...}'
+
+The worker moves into its own network namespace, imports the usual modules
+and then waits for jobs, one JSON line per job on stdin. It never runs a
+snippet itself: every job runs in a forked child that closes the worker's
+pipes, locks itself down (resource limits, no new processes, an audit hook)
+and sends its result back over a pipe of its own. So a snippet can't read
+other jobs or answer for them, and whatever it changes dies with the child.
+The worker answers one JSON line per job, with the job's id.
+
+Uses only the standard library, since -I leaves the project off sys.path.
+"""
+
+import builtins
+import contextlib
+import io
+import json
+import math
+import os
+import resource
+import select
+import signal
+import sys
+import time
+import traceback
+
+# Imported before forking, so snippets get them without paying for it
+PRELOAD = ["bisect", "collections", "csv", "dataclasses", "datetime", "decimal"]
+PRELOAD += ["fractions", "functools", "heapq", "itertools", "json", "math"]
+PRELOAD += ["operator", "random", "re", "statistics", "string", "textwrap"]
+# The kernel doesn't apply RLIMIT_NPROC to root, so a worker started as root
+# runs as nobody, importing through directories it opened before
+NOBODY = 65534
+
+BLOCKED_EVENTS = {
+    "ctypes.dlopen",
+    "ctypes.dlsym",
+    "os.exec",
+    "os.fork",
+    "os.forkpty",
+    "os.kill",
+    "os.killpg",
+    "os.posix_spawn",
+    "os.setns",
+    "os.spawn",
+    "os.symlink",
+    "os.system",
+    "os.unshare",
+    "pty.spawn",
+    "resource.prlimit",
+    "resource.setrlimit",
+    "socket.__new__",
+    "socket.bind",
+    "socket.connect",
+    "socket.getaddrinfo",
+    "subprocess.Popen",
+}
+# Events that change the file system at their first argument, only allowed
+# inside the working directory
+WRITE_EVENTS = {
+    "os.chmod",
+    "os.chown",
+    "os.link",
+    "os.mkdir",
+    "os.remove",
+    "os.rename",
+    "os.rmdir",
+    "os.truncate",
+    "os.utime",
+    "sqlite3.connect",
+}
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_CREAT | os.O_TRUNC
+# A result has three fields of up to max_output_chars characters, each up to
+# six bytes once JSON-escaped
+RESULT_BYTES_PER_CHAR = 18
+RESULT_SLACK = 64 * 1024
+
+
+def _isolate_network() -> bool:
+    """Move into a new user and network namespace, which has no interfaces."""
+    try:
+        os.unshare(os.CLONE_NEWUSER | os.CLONE_NEWNET)
+        return True
+    except (AttributeError, OSError):
+        return False
+
+
+def _open_import_path() -> list[int]:
+    """
+    Open the import path's directories while they are readable and import
+    through /proc/self/fd from then on. The interpreter may live somewhere
+    nobody can't reach (like /root/.pyenv); the open directories still give
+    the whole standard library, extension modules included.
+    """
+    # The worker's own directory is left out, snippets don't need it
+    fds = []
+    remapped = {}
+    for entry in sys.path[1:]:
+        if entry not in remapped and os.path.isdir(entry):
+            fds.append(os.open(entry, os.O_RDONLY | os.O_DIRECTORY))
+            remapped[entry] = f"/proc/self/fd/{fds[-1]}"
+
+    # Longest first, so lib/python3.12/lib-dynload gets its own descriptor
+    prefixes = sorted(remapped, key=len, reverse=True)
+
+    def remap(path: str) -> str:
+        for prefix in prefixes:
+            if path == prefix or path.startswith(prefix + os.sep):
+                return remapped[prefix] + path[len(prefix) :]
+        return path
+
+    sys.path[:] = list(remapped.values())
+    # Packages already imported, like encodings, find their submodules here
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__path__", None)
+        if isinstance(path, list):
+            path[:] = [remap(entry) for entry in path]
+    sys.path_importer_cache.clear()
+    return fds
+
+
+def _drop_root(workdir: str) -> None:
+    if os.geteuid() != 0:
+        return
+    os.chown(workdir, NOBODY, NOBODY)
+    os.setgroups([])
+    os.setgid(NOBODY)
+    os.setuid(NOBODY)
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit] + "…(truncated)"
+
+
+def _inside(path, workdir: str) -> bool:
+    # Already open descriptors were checked when they were opened
+    if isinstance(path, int):
+        return True
+    real = os.path.realpath(os.fsdecode(path))
+    return real == workdir or real.startswith(workdir + os.sep)
+
+
+def _audit_hook(workdir: str):
+    def audit(event: str, args: tuple) -> None:
+        if event in BLOCKED_EVENTS:
+            raise PermissionError(f"{event} is not allowed in the sandbox")
+        if event == "open":
+            path, mode, flags = args
+            writes = (flags or 0) & WRITE_FLAGS or any(
+                c in (mode or "") for c in "wax+"
+            )
+            if writes and not _inside(path, workdir):
+                raise PermissionError(f"writing {path} is not allowed in the sandbox")
+        elif event in WRITE_EVENTS and args:
+            targets = args[:2] if event in ("os.link", "os.rename") else args[:1]
+            for target in targets:
+                if target is not None and not _inside(target, workdir):
+                    raise PermissionError(f"{event} {target} is not allowed")
+
+    return audit
+
+
+def _run_child(
+    job: dict, config: dict, result_fd: int, workdir: str, keep_fds: list[int]
+) -> None:
+    """In the forked child: lock down, run the snippet, write the result."""
+    # Only the result pipe and the import path's directories stay open
+    low = 3
+    for fd in sorted([result_fd, *keep_fds]):
+        os.closerange(low, fd)
+        low = fd + 1
+    os.closerange(low, os.sysconf("SC_OPEN_MAX"))
+
+    memory = config["memory_bytes"]
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    file_size = config["file_size_bytes"]
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_size, file_size))
+    # SIGXCPU at the soft limit, SIGKILL a second later if it is ignored
+    cpu = math.ceil(job["cpu_seconds"])
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    # No new processes or threads, whatever API a snippet finds to ask
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    sys.addaudithook(_audit_hook(workdir))
+
+    max_output = config["max_output_chars"]
+    output = io.StringIO()
+    namespace = {"__name__": "__sandbox__", "__builtins__": builtins}
+    message = {"ok": True, "result": None, "error": None}
+    try:
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            exec(job["code"], namespace)
+        if "result" in namespace:
+            message["result"] = _truncate(str(namespace["result"]), max_output)
+    except BaseException as e:
+        message["ok"] = False
+        message["error"] = _truncate(
+            "".join(traceback.format_exception_only(e)).strip(), max_output
+        )
+    message["output"] = _truncate(output.getvalue(), max_output)
+
+    data = json.dumps(message).encode()
+    view = memoryview(data)
+    while view:
+        view = view[os.write(result_fd, view) :]
+
+
+def _read_result(fd: int, deadline: float, limit: int) -> bytes | None:
+    """The child's result, None if it ran past the deadline or the limit."""
+    chunks = []
+    size = 0
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            return None
+        chunk = os.read(fd, 65536)
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+
+
+def _run_job(job: dict, config: dict, workdir: str, keep_fds: list[int]) -> dict:
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            _run_child(job, config, write_fd, workdir, keep_fds)
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    deadline = time.monotonic() + job["wall_seconds"]
+    limit = RESULT_BYTES_PER_CHAR * config["max_output_chars"] + RESULT_SLACK
+    try:
+        data = _read_result(read_fd, deadline, limit)
+    finally:
+        os.close(read_fd)
+    if data is None:
+        os.kill(pid, signal.SIGKILL)
+    _, status = os.waitpid(pid, 0)
+
+    if data is None:
+        error = f"wall-clock limit of {job['wall_seconds']}s exceeded"
+        return {"ok": False, "error": f"{error} or result too large"}
+    if os.WIFSIGNALED(status):
+        # Only the CPU limits send these, a timed out child was handled above
+        if os.WTERMSIG(status) in (signal.SIGXCPU, signal.SIGKILL):
+            error = f"cpu time limit of {job['cpu_seconds']}s exceeded"
+        else:
+            error = f"killed by signal {os.WTERMSIG(status)}"
+        return {"ok": False, "error": error}
+    try:
+        message = json.loads(data)
+        return {key: message.get(key) for key in ("ok", "result", "error", "output")}
+    except (ValueError, AttributeError):
+        return {"ok": False, "error": "the snippet sent an invalid result"}
+
+
+def main() -> None:
+    config = json.loads(sys.argv[1])
+    workdir = os.path.realpath(os.getcwd())
+
+    # Keep the pipes to the pool on private descriptors, snippets get
+    # /dev/null for stdin, stdout and stderr
+    commands = os.fdopen(os.dup(0), "rb")
+    replies = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+    for module in PRELOAD:
+        __import__(module)
+    import_fds = _open_import_path() if os.geteuid() == 0 else []
+    _drop_root(workdir)
+    network_namespace = _isolate_network()
+
+    def reply(message: dict) -> None:
+        replies.write(json.dumps(message).encode() + b"\n")
+        replies.flush()
+
+    reply({"ready": True, "network_namespace": network_namespace})
+    for line in commands:
+        job = json.loads(line)
+        message = {"result": None, "error": None, "output": ""}
+        message.update(_run_job(job, config, workdir, import_fds))
+        message["id"] = job["id"]
+        reply(message)
+
+
+if __name__ == "__main__":
+    main()
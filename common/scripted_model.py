@@ -0,0 +1,114 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseCreatedEvent,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+from openai.types.responses.response_usage import (
+    InputTokensDetails,
+    OutputTokensDetails,
+)
+
+from agents import Model, ModelResponse, Usage
+
+SCRIPT = (
+    "Streaming responses token by token keeps the user engaged while the model "
+    "is still thinking about the rest of the answer. "
+)
+
+
+class ScriptedModel(Model):
+    """
+    A model that replays a fixed script. It waits `latency` seconds before the
+    first token and then emits `tokens` words at `token_rate` tokens per second.
+    """
+
+    def __init__(
+        self, tokens: int = 200, token_rate: float = 100, latency: float = 0.2
+    ):
+        self.tokens = tokens
+        self.token_rate = token_rate
+        self.latency = latency
+        words = SCRIPT.split()
+        self._deltas = [f"{words[i % len(words)]} " for i in range(tokens)]
+
+    def _response(self, text: str | None = None) -> Response:
+        output = []
+        usage = None
+        if text is not None:
+            output = [
+                ResponseOutputMessage(
+                    id="msg_scripted",
+                    content=[
+                        ResponseOutputText(
+                            annotations=[], text=text, type="output_text"
+                        )
+                    ],
+                    role="assistant",
+                    status="completed",
+                    type="message",
+                )
+            ]
+            usage = ResponseUsage(
+                input_tokens=0,
+                output_tokens=self.tokens,
+                total_tokens=self.tokens,
+                input_tokens_details=InputTokensDetails(cached_tokens=0),
+                output_tokens_details=OutputTokensDetails(reasoning_tokens=0),
+            )
+
+        return Response(
+            id="resp_scripted",
+            created_at=time.time(),
+            model="scripted",
+            object="response",
+            output=output,
+            parallel_tool_calls=False,
+            tool_choice="auto",
+            tools=[],
+            usage=usage,
+        )
+
+    async def get_response(self, *args, **kwargs) -> ModelResponse:
+        await asyncio.sleep(self.latency + self.tokens / self.token_rate)
+        response = self._response("".join(self._deltas))
+        return ModelResponse(
+            output=response.output,
+            usage=Usage(requests=1, output_tokens=self.tokens),
+            response_id=response.id,
+        )
+
+    async def stream_response(self, *args, **kwargs) -> AsyncIterator:
+        yield ResponseCreatedEvent(
+            response=self._response(), sequence_number=0, type="response.created"
+        )
+        await asyncio.sleep(self.latency)
+
+        # Sleep against a schedule so the rate holds even if the loop is busy
+        started = time.perf_counter()
+        for i, delta in enumerate(self._deltas):
+            delay = started + i / self.token_rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield ResponseTextDeltaEvent(
+                content_index=0,
+                delta=delta,
+                item_id="msg_scripted",
+                logprobs=[],
+                output_index=0,
+                sequence_number=i + 1,
+                type="response.output_text.delta",
+            )
+
+        yield ResponseCompletedEvent(
+            response=self._response("".join(self._deltas)),
+            sequence_number=len(self._deltas) + 1,
+            type="response.completed",
+        )
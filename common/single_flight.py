@@ -0,0 +1,107 @@
+import asyncio
+import functools
+import inspect
+import json
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from agents import RunContextWrapper
+
+
+@dataclass
+class FlightStats:
+    calls: int = 0
+    executions: int = 0
+
+    @property
+    def coalesced(self) -> int:
+        return self.calls - self.executions
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.coalesced / self.calls, 3) if self.calls else 0.0,
+        }
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+_stats: dict[str, FlightStats] = {}
+
+
+def single_flight_stats() -> dict[str, dict]:
+    """Calls, executions and coalesced calls per single-flight function."""
+    return {name: stats.as_dict() for name, stats in _stats.items()}
+
+
+def single_flight[F: Callable[..., Awaitable]](
+    func: F | None = None,
+    *,
+    name: str | None = None,
+    key: Callable[..., object] | None = None,
+) -> F:
+    """
+    Coalesce concurrent calls with the same arguments into one execution.
+
+    Put it under @function_tool:
+
+        @function_tool
+        @single_flight
+        async def fetch_weather(location: Location) -> str: ...
+
+    While a call is running, identical calls (same arguments after
+    normalizing, so dict key order doesn't matter) wait for it and get the
+    same result or exception instead of running again. The run context is
+    not part of the key; pass `key` to compute it from the arguments
+    yourself. The shared execution is only cancelled once every caller
+    waiting for it is cancelled.
+    """
+    if func is None:
+        return functools.partial(single_flight, name=name, key=key)
+    if not inspect.iscoroutinefunction(func):
+        raise TypeError("single_flight only works with async functions")
+
+    signature = inspect.signature(func)
+    stats = _stats.setdefault(name or func.__name__, FlightStats())
+    flights: dict[str, _Flight] = {}
+
+    def flight_key(args, kwargs) -> str:
+        if key is not None:
+            return repr(key(*args, **kwargs))
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = {
+            param: value
+            for param, value in bound.arguments.items()
+            if not isinstance(value, RunContextWrapper)
+        }
+        return json.dumps(arguments, sort_keys=True, default=repr)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        stats.calls += 1
+        flight_id = flight_key(args, kwargs)
+        flight = flights.get(flight_id)
+        if flight is None:
+            stats.executions += 1
+            flight = _Flight(asyncio.ensure_future(func(*args, **kwargs)))
+            flights[flight_id] = flight
+            flight.task.add_done_callback(lambda _: flights.pop(flight_id, None))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    return wrapper
@@ -0,0 +1,271 @@
+import asyncio
+import queue
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from agents import TResponseInputItem
+from agents.memory import SessionABC
+
+from .codec import ItemCodec, StorageFormat, read_only_uri
+
+POOL_SIZE = 4
+BUSY_TIMEOUT_MS = 5000
+
+
+class SQLitePool:
+    """
+    A small, thread-safe pool of connections to a single SQLite file.
+
+    Every connection is opened once in WAL mode with synchronous=NORMAL (safe
+    under WAL, only the last transactions can be lost on power failure) and a
+    busy timeout, so concurrent writers wait for the lock instead of failing.
+    The schema is the one used by agents.SQLiteSession, so existing databases
+    can be opened as they are. `storage_format` picks how new items are
+    encoded (see ItemCodec); rows in either format are always readable. A
+    `read_only` pool leaves the file exactly as it is, journal mode included,
+    and fails with sqlite3.OperationalError instead of creating a missing one.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        size: int = POOL_SIZE,
+        busy_timeout_ms: int = BUSY_TIMEOUT_MS,
+        synchronous: str = "NORMAL",
+        sessions_table: str = "agent_sessions",
+        messages_table: str = "agent_messages",
+        storage_format: StorageFormat = "json",
+        read_only: bool = False,
+    ):
+        self.db_path = str(db_path)
+        self.read_only = read_only
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.sessions_table = sessions_table
+        self.messages_table = messages_table
+        self._idle: queue.Queue[sqlite3.Connection] = queue.Queue(maxsize=size)
+        self._columns: set[tuple[str, str]] = set()
+        self._connections = [self._connect() for _ in range(size)]
+        if not read_only:
+            self._init_schema(self._connections[0])
+        for conn in self._connections:
+            self._idle.put(conn)
+        self.codec = ItemCodec(
+            self.db_path, f"{messages_table}_dicts", storage_format=storage_format
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            read_only_uri(self.db_path) if self.read_only else self.db_path,
+            check_same_thread=False,
+            timeout=self.busy_timeout_ms / 1000,
+            uri=self.read_only,
+        )
+        if self.read_only:
+            conn.execute("PRAGMA query_only=ON")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            return conn
+
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _init_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.sessions_table} (
+                session_id TEXT PRIMARY KEY,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.messages_table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                message_data TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (session_id) REFERENCES {self.sessions_table} (session_id)
+                    ON DELETE CASCADE
+            )
+            """
+        )
+        conn.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_{self.messages_table}_session_id
+            ON {self.messages_table} (session_id, created_at)
+            """
+        )
+        conn.commit()
+
+    def ensure_column(self, table: str, column: str, definition: str) -> None:
+        """Add `column` to `table` unless it already exists."""
+        if (table, column) in self._columns:
+            return
+
+        with self.connection() as conn:
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        self._columns.add((table, column))
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a connection, blocking while all of them are in use. The
+        transaction is committed on success and rolled back on error.
+        """
+        conn = self._idle.get()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        for conn in self._connections:
+            conn.close()
+
+
+class PooledSQLiteSession(SessionABC):
+    """
+    Drop-in replacement for agents.SQLiteSession that borrows connections
+    from a shared SQLitePool instead of opening its own.
+    """
+
+    def __init__(self, session_id: str, pool: SQLitePool):
+        self.session_id = session_id
+        self.pool = pool
+        self._sessions = pool.sessions_table
+        self._messages = pool.messages_table
+
+    async def get_items(self, limit: int | None = None) -> list[TResponseInputItem]:
+        def _get_items_sync():
+            with self.pool.connection() as conn:
+                if limit is None:
+                    rows = conn.execute(
+                        f"""
+                        SELECT message_data FROM {self._messages}
+                        WHERE session_id = ?
+                        ORDER BY created_at ASC, id ASC
+                        """,
+                        (self.session_id,),
+                    ).fetchall()
+                else:
+                    rows = conn.execute(
+                        f"""
+                        SELECT message_data FROM {self._messages}
+                        WHERE session_id = ?
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT ?
+                        """,
+                        (self.session_id, limit),
+                    ).fetchall()
+                    rows.reverse()
+
+            items = []
+            for (message_data,) in rows:
+                try:
+                    items.append(self.pool.codec.decode(message_data))
+                except ValueError:
+                    continue
+            return items
+
+        return await asyncio.to_thread(_get_items_sync)
+
+    async def add_items(self, items: list[TResponseInputItem]) -> None:
+        if not items:
+            return
+
+        def _add_items_sync():
+            with self.pool.connection() as conn:
+                conn.execute(
+                    f"""
+                    INSERT INTO {self._sessions} (session_id) VALUES (?)
+                    ON CONFLICT (session_id) DO UPDATE
+                    SET updated_at = CURRENT_TIMESTAMP
+                    """,
+                    (self.session_id,),
+                )
+                self._insert_rows(conn, items)
+
+        await asyncio.to_thread(_add_items_sync)
+
+    def _insert_rows(
+        self, conn: sqlite3.Connection, items: list[TResponseInputItem]
+    ) -> None:
+        conn.executemany(
+            f"""
+            INSERT INTO {self._messages} (session_id, message_data)
+            VALUES (?, ?)
+            """,
+            [(self.session_id, self.pool.codec.encode(item)) for item in items],
+        )
+
+    async def pop_item(self) -> TResponseInputItem | None:
+        def _pop_item_sync():
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    f"""
+                    DELETE FROM {self._messages}
+                    WHERE id = (
+                        SELECT id FROM {self._messages}
+                        WHERE session_id = ?
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT 1
+                    )
+                    RETURNING message_data
+                    """,
+                    (self.session_id,),
+                ).fetchone()
+
+            if row is None:
+                return None
+            try:
+                return self.pool.codec.decode(row[0])
+            except ValueError:
+                return None
+
+        return await asyncio.to_thread(_pop_item_sync)
+
+    async def replace_items(self, items: list[TResponseInputItem]) -> None:
+        """Make `items` the whole history, in a single transaction."""
+
+        def _replace_items_sync():
+            with self.pool.connection() as conn:
+                conn.execute(
+                    f"DELETE FROM {self._messages} WHERE session_id = ?",
+                    (self.session_id,),
+                )
+                conn.execute(
+                    f"""
+                    INSERT INTO {self._sessions} (session_id) VALUES (?)
+                    ON CONFLICT (session_id) DO UPDATE
+                    SET updated_at = CURRENT_TIMESTAMP
+                    """,
+                    (self.session_id,),
+                )
+                self._insert_rows(conn, items)
+
+        await asyncio.to_thread(_replace_items_sync)
+
+    async def clear_session(self) -> None:
+        def _clear_session_sync():
+            with self.pool.connection() as conn:
+                conn.execute(
+                    f"DELETE FROM {self._messages} WHERE session_id = ?",
+                    (self.session_id,),
+                )
+                conn.execute(
+                    f"DELETE FROM {self._sessions} WHERE session_id = ?",
+                    (self.session_id,),
+                )
+
+        await asyncio.to_thread(_clear_session_sync)
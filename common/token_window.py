@@ -0,0 +1,141 @@
+import asyncio
+import sqlite3
+
+from agents import TResponseInputItem
+
+from .sqlite import PooledSQLiteSession, SQLitePool
+from .tokens import CHARS_PER_TOKEN, count_item_tokens
+
+HISTORY_TOKEN_BUDGET = 4000
+# Tokens of a row without a stored count. Only JSON text is estimated from its
+# length; compressed rows are counted by fill_token_counts() before a read
+ESTIMATED_TOKENS = (
+    "COALESCE(token_count, CASE WHEN typeof(message_data) = 'text' "
+    f"THEN length(message_data) / {CHARS_PER_TOKEN} END, 0)"
+)
+
+
+def fill_token_counts(
+    pool: SQLitePool, conn: sqlite3.Connection, session_id: str
+) -> None:
+    """
+    Store the token counts of the session's rows that are not JSON text and
+    have none, e.g. rows re-encoded by an older common.migrate. Their size
+    says nothing about their tokens.
+    """
+    rows = conn.execute(
+        f"""
+        SELECT id, message_data FROM {pool.messages_table}
+        WHERE session_id = ? AND token_count IS NULL
+          AND typeof(message_data) != 'text'
+        """,
+        (session_id,),
+    ).fetchall()
+
+    counts = []
+    for row_id, message_data in rows:
+        try:
+            counts.append((count_item_tokens(pool.codec.decode(message_data)), row_id))
+        except ValueError:
+            continue
+    conn.executemany(
+        f"UPDATE {pool.messages_table} SET token_count = ? WHERE id = ?", counts
+    )
+
+
+class TokenWindowSession(PooledSQLiteSession):
+    """
+    A pooled session that only hands the model the newest history items that
+    fit in `token_budget` tokens.
+
+    Each item's token count is computed once when it is added and stored in a
+    token_count column, so the window is a running sum in SQL instead of
+    re-tokenizing the history on every turn. JSON text rows written without a
+    count (older rows, or by a plain SQLiteSession) are estimated from their
+    size, compressed rows get their count stored on the first read.
+    The window always starts at a user message, so a tool call is never sent
+    without the turn that produced it. A system message at the very start of
+    the history, like the summary written by CompactingSession, is always
+    included and counts against the budget.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        pool: SQLitePool,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+    ):
+        super().__init__(session_id, pool)
+        self.token_budget = token_budget
+        pool.ensure_column(self._messages, "token_count", "INTEGER")
+
+    def _insert_rows(
+        self, conn: sqlite3.Connection, items: list[TResponseInputItem]
+    ) -> None:
+        conn.executemany(
+            f"""
+            INSERT INTO {self._messages} (session_id, message_data, token_count)
+            VALUES (?, ?, ?)
+            """,
+            [
+                (self.session_id, self.pool.codec.encode(item), count_item_tokens(item))
+                for item in items
+            ],
+        )
+
+    async def get_all_items(self) -> list[TResponseInputItem]:
+        """The whole stored history, without applying the token budget."""
+        return await super().get_items()
+
+    async def get_items(self, limit: int | None = None) -> list[TResponseInputItem]:
+        def _get_items_sync():
+            with self.pool.connection() as conn:
+                fill_token_counts(self.pool, conn, self.session_id)
+                first = conn.execute(
+                    f"""
+                    SELECT id, message_data, {ESTIMATED_TOKENS}
+                    FROM {self._messages}
+                    WHERE session_id = ?
+                    ORDER BY created_at ASC, id ASC
+                    LIMIT 1
+                    """,
+                    (self.session_id,),
+                ).fetchone()
+                if first is None:
+                    return []
+
+                pinned_id, budget = -1, self.token_budget
+                if self.pool.codec.decode(first[1]).get("role") == "system":
+                    pinned_id, budget = first[0], budget - first[2]
+
+                rows = conn.execute(
+                    f"""
+                    SELECT message_data FROM (
+                        SELECT message_data, created_at, id,
+                               SUM({ESTIMATED_TOKENS})
+                                 OVER (ORDER BY created_at DESC, id DESC) AS used
+                        FROM {self._messages}
+                        WHERE session_id = ? AND id != ?
+                    )
+                    WHERE used <= ?
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT ?
+                    """,
+                    (self.session_id, pinned_id, budget, limit or -1),
+                ).fetchall()
+            rows.reverse()
+
+            items = []
+            for (message_data,) in rows:
+                try:
+                    items.append(self.pool.codec.decode(message_data))
+                except ValueError:
+                    continue
+
+            while items and items[0].get("role") != "user":
+                items.pop(0)
+            if pinned_id != -1:
+                items.insert(0, self.pool.codec.decode(first[1]))
+            return items
+
+        return await asyncio.to_thread(_get_items_sync)
@@ -0,0 +1,31 @@
+import json
+from functools import cache
+
+import tiktoken
+
+from agents import TResponseInputItem
+
+ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
+
+
+@cache
+def _encoding() -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.get_encoding(ENCODING)
+    except Exception:
+        # The encoding is downloaded on first use, fall back to an estimate
+        # when that is not possible
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_item_tokens(item: TResponseInputItem) -> int:
+    """Tokens of an input item as it is serialized for the model."""
+    return count_tokens(json.dumps(item, ensure_ascii=False))
@@ -0,0 +1,331 @@
+"""
+Export, import and replay the sessions stored in a session database.
+
+    python -m common.transfer export day-12/weather.sql weather.jsonl
+    python -m common.transfer import weather.jsonl copy.sql --format zstd
+    python -m common.transfer replay day-12/weather.sql weather --clients 20
+
+Export and import stream rows in batches, so memory use does not depend on the
+size of the database. Every JSONL line is one item:
+
+    {"session_id": "...", "created_at": "...", "item": {...}}
+
+Imported items keep their created_at in new sessions. Items for sessions that
+already exist are appended after their history with fresh timestamps, since
+sessions are read in created_at order.
+
+Replay sends a recorded session's user turns, in order, to an agent with a
+fresh session per client, and reports turn latency; with --scripted it uses a
+ScriptedModel, so the same workload can be repeated without an API key.
+"""
+
+import argparse
+import asyncio
+import sqlite3
+import statistics
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import nullcontext
+
+import orjson
+
+from agents import (
+    Agent,
+    Runner,
+    SQLiteSession,
+    set_tracing_disabled,
+)
+from config import with_env
+
+from .scripted_model import ScriptedModel
+from .sqlite import SQLitePool
+from .tokens import count_item_tokens
+
+BATCH_SIZE = 1000
+# Fast enough to load the rest of the stack, slow enough to overlap clients
+SCRIPTED_MODEL = ScriptedModel(tokens=50, token_rate=1000, latency=0.05)
+
+
+def export_sessions(
+    pool: SQLitePool,
+    out,
+    session_ids: list[str] | None = None,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Write the items of `session_ids` (all sessions if None) to `out` as JSONL."""
+    where = ""
+    if session_ids:
+        where = f"WHERE session_id IN ({', '.join('?' * len(session_ids))})"
+
+    exported = 0
+    with pool.connection() as conn:
+        cursor = conn.execute(
+            f"""
+            SELECT session_id, created_at, message_data FROM {pool.messages_table}
+            {where}
+            ORDER BY session_id, created_at, id
+            """,
+            session_ids or (),
+        )
+        while rows := cursor.fetchmany(batch_size):
+            lines = []
+            for session_id, created_at, message_data in rows:
+                try:
+                    item = pool.codec.decode(message_data)
+                except ValueError:
+                    continue
+                record = {
+                    "session_id": session_id,
+                    "created_at": created_at,
+                    "item": item,
+                }
+                lines.append(orjson.dumps(record) + b"\n")
+            out.write(b"".join(lines))
+            exported += len(lines)
+    return exported
+
+
+def read_jsonl(source) -> Iterator[dict]:
+    for line in source:
+        if line.strip():
+            yield orjson.loads(line)
+
+
+def import_sessions(pool: SQLitePool, source, batch_size: int = BATCH_SIZE) -> int:
+    """Append the items of a JSONL export to the sessions in `pool`."""
+    with pool.connection() as conn:
+        columns = {
+            row[1] for row in conn.execute(f"PRAGMA table_info({pool.messages_table})")
+        }
+    # Fill in token counts when the database is used by TokenWindowSession
+    with_tokens = "token_count" in columns
+    # Session id -> whether it existed before this import
+    existed: dict[str, bool] = {}
+
+    imported = 0
+    batch: list[dict] = []
+    for record in read_jsonl(source):
+        batch.append(record)
+        if len(batch) == batch_size:
+            imported += _insert_batch(pool, batch, with_tokens, existed)
+            batch = []
+    if batch:
+        imported += _insert_batch(pool, batch, with_tokens, existed)
+    return imported
+
+
+def _insert_batch(
+    pool: SQLitePool, batch: list[dict], with_tokens: bool, existed: dict[str, bool]
+) -> int:
+    encode = pool.codec.encode
+    sessions = {}
+    for record in batch:
+        sessions.setdefault(record["session_id"], record["created_at"])
+
+    with pool.connection() as conn:
+        new = [session_id for session_id in sessions if session_id not in existed]
+        if new:
+            found = conn.execute(
+                f"""
+                SELECT session_id FROM {pool.sessions_table}
+                WHERE session_id IN ({", ".join("?" * len(new))})
+                """,
+                new,
+            ).fetchall()
+            existed |= dict.fromkeys(new, False) | {row[0]: True for row in found}
+        # NULL becomes CURRENT_TIMESTAMP, ties keep the import order by id
+        batch = [
+            r | {"created_at": None} if existed[r["session_id"]] else r for r in batch
+        ]
+
+        conn.executemany(
+            f"""
+            INSERT INTO {pool.sessions_table} (session_id, created_at) VALUES (?, ?)
+            ON CONFLICT (session_id) DO UPDATE SET updated_at = CURRENT_TIMESTAMP
+            """,
+            sessions.items(),
+        )
+        if with_tokens:
+            conn.executemany(
+                f"""
+                INSERT INTO {pool.messages_table}
+                    (session_id, message_data, created_at, token_count)
+                VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+                """,
+                [
+                    (
+                        r["session_id"],
+                        encode(r["item"]),
+                        r["created_at"],
+                        count_item_tokens(r["item"]),
+                    )
+                    for r in batch
+                ],
+            )
+        else:
+            conn.executemany(
+                f"""
+                INSERT INTO {pool.messages_table}
+                    (session_id, message_data, created_at)
+                VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+                """,
+                [(r["session_id"], encode(r["item"]), r["created_at"]) for r in batch],
+            )
+    return len(batch)
+
+
+def user_turns(source: str, session_id: str) -> list[str]:
+    """The user messages of a session, from a database or a JSONL export."""
+    if source.endswith(".jsonl"):
+        with open(source, "rb") as f:
+            items = [r["item"] for r in read_jsonl(f) if r["session_id"] == session_id]
+    else:
+        pool = SQLitePool(source, size=1, read_only=True)
+        with pool.connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT message_data FROM {pool.messages_table}
+                WHERE session_id = ?
+                ORDER BY created_at, id
+                """,
+                (session_id,),
+            ).fetchall()
+        items = [pool.codec.decode(message_data) for (message_data,) in rows]
+        pool.close()
+
+    turns = []
+    for item in items:
+        if item.get("role") != "user" or item.get("type", "message") != "message":
+            continue
+        content = item["content"]
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content)
+        turns.append(content)
+    return turns
+
+
+async def replay(agent: Agent, turns: list[str], clients: int, rounds: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+
+    async def client(client_id: int) -> None:
+        nonlocal errors
+        for round_id in range(rounds):
+            session = SQLiteSession(f"replay_{client_id}_{round_id}")
+            for turn in turns:
+                started = time.perf_counter()
+                try:
+                    await Runner.run(agent, turn, session=session)
+                except Exception as e:
+                    errors += 1
+                    print(f"client {client_id}: {e!r}", file=sys.stderr)
+                    break
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    report = {"turns": len(latencies), "errors": errors, "seconds": elapsed}
+    if latencies:
+        cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+        report |= {
+            "turns_per_sec": len(latencies) / elapsed,
+            "p50_ms": cuts[49] * 1000,
+            "p95_ms": cuts[94] * 1000,
+            "max_ms": max(latencies) * 1000,
+        }
+    return report
+
+
+@with_env
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="database to JSONL")
+    export_parser.add_argument("db_path")
+    export_parser.add_argument("out", help="JSONL file, - for stdout")
+    export_parser.add_argument("--session", action="append", dest="sessions")
+
+    import_parser = commands.add_parser("import", help="JSONL to database")
+    import_parser.add_argument("source", help="JSONL file, - for stdin")
+    import_parser.add_argument("db_path")
+    import_parser.add_argument("--format", choices=["json", "zstd"], default="json")
+
+    replay_parser = commands.add_parser("replay", help="replay a session's turns")
+    replay_parser.add_argument("source", help="database or JSONL export")
+    replay_parser.add_argument("session_id")
+    replay_parser.add_argument("--clients", type=int, default=1)
+    replay_parser.add_argument("--rounds", type=int, default=1)
+    replay_parser.add_argument("--model", default=None)
+    replay_parser.add_argument("--instructions", default="You are a helpful assistant.")
+    replay_parser.add_argument(
+        "--scripted", action="store_true", help="answer with a ScriptedModel"
+    )
+
+    for command in (export_parser, import_parser):
+        command.add_argument("--messages-table", default="agent_messages")
+        command.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        try:
+            turns = user_turns(args.source, args.session_id)
+        except sqlite3.OperationalError as e:
+            sys.exit(f"can't read {args.source}: {e}")
+        if not turns:
+            sys.exit(f"no user turns in session {args.session_id}")
+        if args.scripted:
+            set_tracing_disabled(True)
+        agent = Agent(
+            name="Assistant",
+            instructions=args.instructions,
+            model=SCRIPTED_MODEL if args.scripted else args.model,
+        )
+        report = asyncio.run(replay(agent, turns, args.clients, args.rounds))
+        print(orjson.dumps(report, option=orjson.OPT_INDENT_2).decode())
+        return
+
+    started = time.perf_counter()
+    if args.command == "export":
+        try:
+            pool = SQLitePool(
+                args.db_path,
+                size=1,
+                messages_table=args.messages_table,
+                read_only=True,
+            )
+            out = (
+                nullcontext(sys.stdout.buffer)
+                if args.out == "-"
+                else open(args.out, "wb")
+            )
+            with out as f:
+                count = export_sessions(pool, f, args.sessions, args.batch_size)
+        except sqlite3.OperationalError as e:
+            sys.exit(f"can't read {args.db_path}: {e}")
+    else:
+        pool = SQLitePool(
+            args.db_path,
+            size=1,
+            messages_table=args.messages_table,
+            storage_format=args.format,
+        )
+        source = (
+            nullcontext(sys.stdin.buffer)
+            if args.source == "-"
+            else open(args.source, "rb")
+        )
+        with source as f:
+            count = import_sessions(pool, f, args.batch_size)
+    pool.close()
+    print(
+        f"{args.command}ed {count} items in {time.perf_counter() - started:.2f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
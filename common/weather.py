@@ -0,0 +1,42 @@
+from .http import http_client
+from .ttl_cache import TTLCache
+
+OPENWEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+# 0.05° is roughly 5km, the weather is the same anywhere inside one cell
+GRID_DEGREES = 0.05
+TTL_SECONDS = 600.0
+
+weather_cache: TTLCache[tuple, dict] = TTLCache(ttl=TTL_SECONDS)
+
+
+async def fetch_current_weather(
+    lat: float,
+    long: float,
+    api_key: str,
+    base_url: str = OPENWEATHER_URL,
+    grid: float = GRID_DEGREES,
+) -> dict:
+    """
+    Current weather from the OpenWeather API for the grid cell of (lat, long).
+
+    Coordinates are snapped to a `grid` degree grid and the response is cached
+    for TTL_SECONDS, so repeated or nearby lookups don't hit the network.
+    """
+    cell = (round(lat / grid), round(long / grid))
+    key = (base_url, grid, *cell)
+    data = weather_cache.get(key)
+    if data is not None:
+        return data
+
+    params = {
+        "lat": round(cell[0] * grid, 4),
+        "lon": round(cell[1] * grid, 4),
+        "appid": api_key,
+        "units": "metric",
+    }
+    response = await http_client().get(base_url, params=params)
+    response.raise_for_status()
+
+    data = response.json()
+    weather_cache.set(key, data)
+    return data
@@ -0,0 +1,109 @@
+"""
+A local stand-in for the OpenWeather current weather API.
+
+    python -m common.weather_stub --port 8099 --latency 0.2
+    OPENWEATHER_URL=http://127.0.0.1:8099/data/2.5/weather python main_1.py
+
+Answers /data/2.5/weather with made-up but stable weather for the requested
+coordinates, after `latency` seconds, and counts the requests and TCP
+connections it served, so caching and connection reuse can be checked.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PATH = "/data/2.5/weather"
+DESCRIPTIONS = ["clear sky", "few clouds", "scattered clouds", "light rain"]
+
+
+class WeatherStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}{PATH}"
+
+    def start(self) -> "WeatherStubServer":
+        """Serve from a daemon thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+    server: WeatherStubServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.count("connections")
+
+    def do_GET(self) -> None:  # noqa: N802
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path != PATH or "lat" not in query or "lon" not in query:
+            self._reply(404, {"cod": "404", "message": "not found"})
+            return
+
+        self.server.count("requests")
+        time.sleep(self.server.latency)
+        lat, lon = float(query["lat"][0]), float(query["lon"][0])
+        temp = round(45 - abs(lat) * 0.5 + lon * 0.05, 2)
+        self._reply(
+            200,
+            {
+                "coord": {"lat": lat, "lon": lon},
+                "weather": [{"description": DESCRIPTIONS[int(lat + lon) % 4]}],
+                "main": {
+                    "temp": temp,
+                    "feels_like": round(temp + 2.5, 2),
+                    "humidity": int(abs(lat * lon)) % 60 + 20,
+                },
+            },
+        )
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = WeatherStubServer(args.port, args.latency)
+    print(f"serving {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"served {server.requests} requests on {server.connections} connections")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Protocol
+
+from tavily import AsyncTavilyClient
+
+from .tokens import count_tokens
+
+MAX_RESULTS = 5
+SEARCH_TTL_SECONDS = 6 * 3600.0
+SEARCH_TOKEN_BUDGET = 600
+MAX_SNIPPET_CHARS = 500
+# Words FakeSearchBackend pads its contents with
+FILLER = (
+    "the a of and to in is for on with best guide review open hours near "
+    "city today price menu address street weather visit popular local"
+).split()
+
+
+class SearchBackend(Protocol):
+    """Anything with Tavily's search(query, max_results=...) -> {"results"}."""
+
+    async def search(self, query: str, max_results: int) -> dict: ...
+
+
+def normalize_query(query: str) -> str:
+    """Case and whitespace don't change what a search finds."""
+    return " ".join(query.casefold().split())
+
+
+class SearchCache:
+    """
+    Search results in SQLite, so they survive restarts. Entries expire `ttl`
+    seconds after they were stored; expired rows are deleted on writes.
+    """
+
+    def __init__(self, db_path: str | Path, ttl: float = SEARCH_TTL_SECONDS):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS search_cache (
+                key TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> list[dict] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results FROM search_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, results: list[dict]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?)",
+                (key, json.dumps(results, ensure_ascii=False), now + self.ttl),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_tavily: AsyncTavilyClient | None = None
+_tavily_key: tuple[asyncio.AbstractEventLoop, str] | None = None
+# Replaced clients being closed, so the tasks aren't garbage collected
+_closing: set[asyncio.Task] = set()
+
+
+def tavily_client(api_key: str) -> AsyncTavilyClient:
+    """
+    The process-wide Tavily client. It keeps its HTTP connections alive
+    between searches; like http_client(), a new one is made for a new event
+    loop or API key.
+    """
+    global _tavily, _tavily_key
+
+    key = (asyncio.get_running_loop(), api_key)
+    if _tavily is None or _tavily_key != key:
+        if _tavily is not None:
+            _close_replaced(_tavily, _tavily_key[0])
+        _tavily = AsyncTavilyClient(api_key=api_key)
+        _tavily_key = key
+    return _tavily
+
+
+def _close_replaced(client: AsyncTavilyClient, loop: asyncio.AbstractEventLoop) -> None:
+    """Close a replaced client on the loop its connections belong to."""
+    if loop is asyncio.get_running_loop():
+        task = loop.create_task(client.close())
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+    elif loop.is_running():
+        asyncio.run_coroutine_threadsafe(client.close(), loop)
+    # A closed loop can't run the close any more, its sockets are released
+    # when the client is garbage collected
+
+
+async def close_tavily_client() -> None:
+    global _tavily, _tavily_key
+
+    if _tavily is not None:
+        await _tavily.close()
+    _tavily = _tavily_key = None
+
+
+class FakeSearchBackend:
+    """
+    An offline stand-in for Tavily. Returns made-up but stable results for
+    each query, with long contents and mixed scores like the real API, after
+    `latency` seconds. Counts the searches it served.
+    """
+
+    def __init__(self, latency: float = 0.3):
+        self.latency = latency
+        self.calls = 0
+
+    async def search(self, query: str, max_results: int = MAX_RESULTS) -> dict:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        seed = hashlib.sha256(query.encode()).digest()
+        rng = random.Random(seed)
+        words = query.split() or ["nothing"]
+        results = []
+        for i in range(max_results):
+            filler = " ".join(rng.choice(words + FILLER) for _ in range(300))
+            results.append(
+                {
+                    "title": f"{query.title()} - result {i + 1}",
+                    "url": f"https://example.com/{seed.hex()[:8]}/{i + 1}",
+                    "content": f"About {query}: {filler}.",
+                    "score": round(rng.random(), 3),
+                    "raw_content": None,
+                }
+            )
+        return {"query": query, "results": results, "response_time": self.latency}
+
+
+def compact_results(
+    results: list[dict],
+    token_budget: int = SEARCH_TOKEN_BUDGET,
+    max_snippet_chars: int = MAX_SNIPPET_CHARS,
+) -> str:
+    """
+    The best-scoring results as title, URL and a snippet of the content cut at
+    `max_snippet_chars`, as many as fit in `token_budget` tokens.
+    """
+    entries = []
+    used = 0
+    for result in sorted(results, key=lambda r: r.get("score") or 0, reverse=True):
+        snippet = " ".join((result.get("content") or "").split())
+        if len(snippet) > max_snippet_chars:
+            snippet = snippet[:max_snippet_chars].rsplit(" ", 1)[0] + "…"
+        entry = f"{result.get('title', '')}\n{result.get('url', '')}\n{snippet}"
+
+        tokens = count_tokens(entry)
+        # A lower-scoring but shorter result may still fit
+        if used + tokens > token_budget:
+            continue
+        entries.append(entry)
+        used += tokens
+    return "\n\n".join(entries)
+
+
+async def search_web(
+    query: str,
+    backend: SearchBackend,
+    cache: SearchCache | None = None,
+    max_results: int = MAX_RESULTS,
+    token_budget: int = SEARCH_TOKEN_BUDGET,
+) -> str:
+    """
+    Search with `backend` and return compact_results() of the results.
+
+    Results are cached by normalized query, so a query differing only in case
+    or spacing is answered from the cache. The raw results are cached, the
+    budget is applied on the way out.
+    """
+    key = f"{max_results}:{normalize_query(query)}"
+    results = await asyncio.to_thread(cache.get, key) if cache else None
+    if results is None:
+        response = await backend.search(query, max_results=max_results)
+        results = (response or {}).get("results") or []
+        # Don't keep a miss around for the whole TTL
+        if cache and results:
+            await asyncio.to_thread(cache.set, key, results)
+
+    if not results:
+        return "No results found"
+    return compact_results(results, token_budget)
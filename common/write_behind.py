@@ -0,0 +1,343 @@
+import asyncio
+import atexit
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Literal
+
+from agents import TResponseInputItem
+from agents.memory import SessionABC
+
+from .sqlite import PooledSQLiteSession, SQLitePool
+from .token_window import TokenWindowSession
+from .tokens import count_item_tokens
+
+FLUSH_INTERVAL = 0.1
+MAX_CACHED_SESSIONS = 1024
+TAIL_SIZE = 500
+
+Durability = Literal["buffered", "committed"]
+# (message_data, token_count), message_data as encoded by the pool's codec
+_Row = tuple[str | bytes, int]
+# (item, token_count)
+_Entry = tuple[TResponseInputItem, int]
+
+
+@dataclass
+class _CachedSession:
+    # Oldest first
+    entries: list[_Entry] = field(default_factory=list)
+    # False if the session has more than tail_size rows, reads then go to
+    # the database
+    complete: bool = True
+
+
+class WriteBehindStore:
+    """
+    Session storage that serves reads from memory and batches writes.
+
+    The items of recently used sessions are cached in memory, decoded and
+    with their token counts (up to `tail_size` items each, least recently
+    used sessions are evicted past `max_sessions`), so a turn neither queries
+    nor parses its history. Returned items are the cached objects themselves
+    and must not be modified. New items are cached right away, encoded once
+    and written to SQLite by a background task every `flush_interval`
+    seconds, all sessions in one transaction.
+
+    `durability` controls when add_items() returns: "buffered" returns
+    immediately, so a crash can lose the last interval of writes; "committed"
+    waits until the batch holding the items is committed, which still groups
+    concurrent writers into one commit. A batch that fails to write stays
+    pending and is retried, its writers keep waiting. Pending writes are
+    flushed by close() and, as a last resort, when the interpreter exits.
+
+    Rows use the same schema as PooledSQLiteSession and carry token counts, so
+    the database stays readable by TokenWindowSession and SessionPruner.
+    """
+
+    def __init__(
+        self,
+        pool: SQLitePool,
+        flush_interval: float = FLUSH_INTERVAL,
+        durability: Durability = "buffered",
+        max_sessions: int = MAX_CACHED_SESSIONS,
+        tail_size: int = TAIL_SIZE,
+        token_budget: int | None = None,
+    ):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.max_sessions = max_sessions
+        self.tail_size = tail_size
+        self.token_budget = token_budget
+        self.flushes = 0
+        self.rows_written = 0
+        self._cache: OrderedDict[str, _CachedSession] = OrderedDict()
+        self._pending: dict[str, list[_Row]] = {}
+        self._committed: asyncio.Future | None = None
+        self._write_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+        pool.ensure_column(pool.messages_table, "token_count", "INTEGER")
+        atexit.register(self._flush_remaining)
+
+    def get(self, session_id: str) -> "WriteBehindSession":
+        return WriteBehindSession(session_id, self)
+
+    async def flush(self) -> None:
+        """Write every pending item in a single transaction."""
+        async with self._write_lock:
+            batch, self._pending = self._pending, {}
+            committed, self._committed = self._committed, None
+            try:
+                if batch:
+                    await asyncio.to_thread(self._write, batch)
+                    self.flushes += 1
+                    self.rows_written += sum(len(rows) for rows in batch.values())
+            except Exception:
+                self._requeue(batch, committed)
+                raise
+            if committed is not None:
+                committed.set_result(None)
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            # Only cancel the flusher between batches, never halfway through one
+            async with self._write_lock:
+                self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+        atexit.unregister(self._flush_remaining)
+
+    async def _add(self, session_id: str, items: list[TResponseInputItem]) -> None:
+        entries = [(item, count_item_tokens(item)) for item in items]
+        encode = self.pool.codec.encode
+        rows = [(encode(item), tokens) for item, tokens in entries]
+        cached = self._cache.get(session_id)
+        if cached is not None:
+            cached.entries.extend(entries)
+            if len(cached.entries) > self.tail_size:
+                # Reloaded on the next read, after the pruner had a chance to run
+                del self._cache[session_id]
+        self._pending.setdefault(session_id, []).extend(rows)
+
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+        self._wakeup.set()
+
+        if self.durability == "committed":
+            if self._committed is None:
+                self._committed = asyncio.get_running_loop().create_future()
+            await asyncio.shield(self._committed)
+
+    async def _entries(self, session_id: str) -> list[_Entry] | None:
+        """
+        Cached items of the session, or None if only the database has them all.
+        """
+        cached = self._cache.get(session_id)
+        if cached is None:
+            # No flush can run meanwhile, so every row is either in the
+            # database or still pending, never both
+            async with self._write_lock:
+                cached = await asyncio.to_thread(self._load, session_id)
+                pending = self._pending.get(session_id, [])
+                cached.entries.extend(self._decode(pending))
+            self._cache[session_id] = cached
+            if len(self._cache) > self.max_sessions:
+                self._cache.popitem(last=False)
+        self._cache.move_to_end(session_id)
+        return cached.entries if cached.complete else None
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            # Give other sessions a chance to join this batch
+            await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # The batch is pending again, retry after the next interval
+                print(f"write-behind flush failed, retrying: {e!r}")
+                self._wakeup.set()
+
+    def _load(self, session_id: str) -> _CachedSession:
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT message_data, token_count FROM {self.pool.messages_table}
+                WHERE session_id = ?
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+                """,
+                (session_id, self.tail_size + 1),
+            ).fetchall()
+        rows.reverse()
+        if len(rows) > self.tail_size:
+            return _CachedSession(self._decode(rows[1:]), complete=False)
+        return _CachedSession(self._decode(rows))
+
+    def _decode(self, rows: list[tuple[str | bytes, int | None]]) -> list[_Entry]:
+        entries = []
+        for message_data, tokens in rows:
+            try:
+                item = self.pool.codec.decode(message_data)
+            except ValueError:
+                continue
+            # Rows stored without a count are counted, not estimated from
+            # their size, which is meaningless for compressed rows
+            entries.append(
+                (item, count_item_tokens(item) if tokens is None else tokens)
+            )
+        return entries
+
+    def _write(self, batch: dict[str, list[_Row]], replace: bool = False) -> None:
+        """Append the rows, or with `replace` make them the sessions' only rows."""
+        sessions = self.pool.sessions_table
+        messages = self.pool.messages_table
+        with self.pool.connection() as conn:
+            if replace:
+                conn.executemany(
+                    f"DELETE FROM {messages} WHERE session_id = ?",
+                    [(session_id,) for session_id in batch],
+                )
+            conn.executemany(
+                f"""
+                INSERT INTO {sessions} (session_id) VALUES (?)
+                ON CONFLICT (session_id) DO UPDATE
+                SET updated_at = CURRENT_TIMESTAMP
+                """,
+                [(session_id,) for session_id in batch],
+            )
+            conn.executemany(
+                f"""
+                INSERT INTO {messages} (session_id, message_data, token_count)
+                VALUES (?, ?, ?)
+                """,
+                [
+                    (session_id, message_data, tokens)
+                    for session_id, rows in batch.items()
+                    for message_data, tokens in rows
+                ],
+            )
+
+    def _requeue(
+        self, batch: dict[str, list[_Row]], committed: asyncio.Future | None
+    ) -> None:
+        """Put a batch that failed to write back in front of the pending rows."""
+        pending, self._pending = self._pending, {}
+        for session_id in batch | pending:
+            rows = batch.get(session_id, []) + pending.get(session_id, [])
+            self._pending[session_id] = rows
+
+        # Waiters of the failed batch wait for the retry; if more items came
+        # in meanwhile they share one future with them
+        if committed is None:
+            return
+        if self._committed is None:
+            self._committed = committed
+        else:
+            self._committed.add_done_callback(
+                lambda done: (
+                    committed.set_result(None)
+                    if done.exception() is None
+                    else committed.set_exception(done.exception())
+                )
+            )
+
+    def _flush_remaining(self) -> None:
+        if self._pending:
+            batch, self._pending = self._pending, {}
+            try:
+                self._write(batch)
+            except Exception:
+                self._requeue(batch, None)
+                raise
+
+
+class WriteBehindSession(SessionABC):
+    """A session whose reads and writes go through a WriteBehindStore."""
+
+    def __init__(self, session_id: str, store: WriteBehindStore):
+        self.session_id = session_id
+        self.store = store
+        self._stored = PooledSQLiteSession(session_id, store.pool)
+
+    async def get_all_items(self) -> list[TResponseInputItem]:
+        entries = await self.store._entries(self.session_id)
+        if entries is None:
+            await self.store.flush()
+            return await self._stored.get_items()
+        return [item for item, _ in entries]
+
+    async def get_items(self, limit: int | None = None) -> list[TResponseInputItem]:
+        budget = self.store.token_budget
+        if budget is None:
+            items = await self.get_all_items()
+        else:
+            entries = await self.store._entries(self.session_id)
+            if entries is None:
+                await self.store.flush()
+                session = TokenWindowSession(self.session_id, self.store.pool, budget)
+                items = await session.get_items()
+            else:
+                items = _window(entries, budget)
+        return items[-limit:] if limit else items
+
+    async def add_items(self, items: list[TResponseInputItem]) -> None:
+        if items:
+            await self.store._add(self.session_id, items)
+
+    async def pop_item(self) -> TResponseInputItem | None:
+        async with self.store._write_lock:
+            self.store._cache.pop(self.session_id, None)
+            pending = self.store._pending.get(self.session_id)
+            if pending:
+                return self.store.pool.codec.decode(pending.pop()[0])
+            return await self._stored.pop_item()
+
+    async def clear_session(self) -> None:
+        async with self.store._write_lock:
+            self.store._pending.pop(self.session_id, None)
+            await self._stored.clear_session()
+            self.store._cache[self.session_id] = _CachedSession()
+
+    async def replace_items(self, items: list[TResponseInputItem]) -> None:
+        """Make `items` the whole history, in a single transaction."""
+        store = self.store
+        encode = store.pool.codec.encode
+        rows = [(encode(item), count_item_tokens(item)) for item in items]
+        async with store._write_lock:
+            # Pending rows are replaced too, rows added meanwhile are kept
+            pending = store._pending.pop(self.session_id, [])
+            try:
+                await asyncio.to_thread(store._write, {self.session_id: rows}, True)
+            except Exception:
+                store._pending[self.session_id] = pending + store._pending.get(
+                    self.session_id, []
+                )
+                raise
+            store._cache.pop(self.session_id, None)
+
+
+def _window(entries: Sequence[_Entry], budget: int) -> list[TResponseInputItem]:
+    """The in-memory equivalent of TokenWindowSession.get_items()."""
+    if not entries:
+        return []
+
+    pinned = None
+    first, first_tokens = entries[0]
+    if first.get("role") == "system":
+        pinned, budget, entries = first, budget - first_tokens, entries[1:]
+
+    start = len(entries)
+    while start > 0 and entries[start - 1][1] <= budget:
+        start -= 1
+        budget -= entries[start][1]
+
+    items = [item for item, _ in entries[start:]]
+    while items and items[0].get("role") != "user":
+        items.pop(0)
+    if pinned is not None:
+        items.insert(0, pinned)
+    return items
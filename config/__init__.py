@@ -1,3 +1,3 @@
-from .env import with_env
+from .env import load_env, with_env
 
-__all__ = ["with_env"]
+__all__ = ["load_env", "with_env"]
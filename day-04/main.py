@@ -1,6 +1,7 @@
 import asyncio
 
 from agents import Agent, Runner, SQLiteSession
+from common import CompactingSession
 from config import with_env
 
 
@@ -31,12 +32,15 @@ async def main():
         instructions="Reply very concisely.",
     )
 
-    session = SQLiteSession("conversation_day04")
+    # Older turns are folded into a summary so the history sent stays bounded
+    session = CompactingSession(SQLiteSession("conversation_day04"))
 
     while True:
-        user_message = input("> ")
+        # Read input off the loop so compaction can run while the user types
+        user_message = await asyncio.to_thread(input, "> ")
         response = await Runner.run(agent, user_message, session=session)
         print(response.final_output)
+        session.schedule_compaction()
 
 
 if __name__ == "__main__":
@@ -1,47 +1,134 @@
 import asyncio
 import os
 
+from pydantic import BaseModel
+
 from agents import Agent, Runner, function_tool
+from common import io_latency_stats, read_page, run_io
 from config import with_env
 
 
+class NewFile(BaseModel):
+    path: str
+    content: str
+
+
+def _make_directory(directory_path: str) -> None:
+    os.makedirs(directory_path, exist_ok=True)
+
+
+def _write_file(file_path: str, content: str = "") -> None:
+    with open(file_path, "w", encoding="utf8") as f:
+        f.write(content)
+
+
+def _create_file_with_parents(file_path: str, content: str) -> None:
+    parent = os.path.dirname(file_path)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    _write_file(file_path, content)
+
+
+async def _run_all(name: str, func, calls: list[tuple]) -> list[str]:
+    """Run the calls concurrently on the I/O pool, return their errors."""
+    results = await asyncio.gather(
+        *(run_io(name, func, *args) for args in calls), return_exceptions=True
+    )
+    return [
+        f"error: {args[0]}: {result!r}"
+        for args, result in zip(calls, results, strict=True)
+        if isinstance(result, Exception)
+    ]
+
+
 @function_tool()
-def read_file(file_path: str):
+async def read_file(file_path: str, offset: int = 0, line: int | None = None):
     """
-    Reads the file at file_path and returns the full content
+    Reads a page of the file at file_path, starting at byte offset, or at line
+    if given. Big files are read one page at a time, read again from the
+    offset given at the end of a page to continue.
     """
-    print(f"Tool Call: read_file with path: {file_path}")
-    with open(file_path, encoding="utf8") as f:
-        return f.read()
+    print(f"Tool Call: read_file with path: {file_path} from {line or offset}")
+    return str(await run_io("read_file", read_page, file_path, offset, line))
 
 
 @function_tool()
-def create_file(file_path: str):
+async def read_files(file_paths: list[str]):
+    """
+    Reads the first page of each file in file_paths. Use read_file to continue
+    reading a file past its first page.
+    """
+    print(f"Tool Call: read_files with {len(file_paths)} paths")
+    results = await asyncio.gather(
+        *(run_io("read_file", read_page, path) for path in file_paths),
+        return_exceptions=True,
+    )
+    return "\n\n".join(
+        f"error: {path}: {result!r}" if isinstance(result, Exception) else str(result)
+        for path, result in zip(file_paths, results, strict=True)
+    )
+
+
+@function_tool()
+async def create_file(file_path: str):
     """
     Creates an empty file at file_path
     """
     print(f"Tool Call: create_file with path: {file_path}")
-    with open(file_path, "w", encoding="utf8") as f:
-        f.write("")
+    await run_io("create_file", _write_file, file_path)
 
 
 @function_tool()
-def create_directory(directory_path: str):
+async def create_directory(directory_path: str):
     """
     Creates a directory at directory_path
     """
     print(f"Tool Call: create_directory with path: {directory_path}")
-    os.makedirs(directory_path, exist_ok=True)
+    await run_io("create_directory", _make_directory, directory_path)
+
+
+@function_tool()
+async def create_tree(directories: list[str], files: list[NewFile]):
+    """
+    Creates several directories and files in one call, e.g. a project
+    skeleton. Parent directories of the files are created as needed, content
+    may be empty.
+    """
+    print(
+        f"Tool Call: create_tree with {len(directories)} directories "
+        f"and {len(files)} files"
+    )
+    # Directories first, so files can't race the creation of their parents
+    directory_errors = await _run_all(
+        "create_directory", _make_directory, [(path,) for path in directories]
+    )
+    file_errors = await _run_all(
+        "create_file",
+        _create_file_with_parents,
+        [(file.path, file.content) for file in files],
+    )
+
+    errors = directory_errors + file_errors
+    created = (
+        f"created {len(directories) - len(directory_errors)} directories "
+        f"and {len(files) - len(file_errors)} files"
+    )
+    if errors:
+        return f"{created}, {len(errors)} failed:\n" + "\n".join(errors)
+    return created
 
 
 @with_env
 async def main():
     agent = Agent(
         name="Assistant",
-        tools=[read_file, create_file, create_directory],
+        tools=[read_file, read_files, create_file, create_directory, create_tree],
         # Not working well with create_file and create_directory
         # model=LitellmModel(model="ollama/llama3.2:3b"),
-        instructions="You are a file system assistant.",
+        instructions=(
+            "You are a file system assistant. To create or read several paths "
+            "at once, use create_tree or read_files in a single call."
+        ),
     )
 
     result = await Runner.run(
@@ -49,6 +136,7 @@ async def main():
     )
     # print(result.to_input_list())
     print(result.final_output)
+    print(io_latency_stats())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,180 @@
+"""
+Offline load test for the /chat endpoint.
+
+The server runs in a child process with a ScriptedModel in place of a real LLM,
+so no API key or network is needed. N concurrent clients stream /chat and we
+report time-to-first-token, tokens/sec, latency percentiles and server RSS per
+stream. Run it from this directory:
+
+    python bench.py --clients 50 --rounds 4 --tokens 300 --token-rate 200
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+from pathlib import Path
+
+import httpx
+
+from common import ScriptedModel
+
+
+def serve(args: argparse.Namespace) -> None:
+    import main
+    import uvicorn
+
+    from agents import set_tracing_disabled
+
+    set_tracing_disabled(True)
+    main.FLUSH_INTERVAL_MS = args.flush_ms
+    main.FLUSH_MAX_BYTES = args.flush_bytes
+    main.agents = main.AgentRegistry(
+        model=ScriptedModel(args.tokens, args.token_rate, args.latency)
+    )
+    main.admission = main.AdmissionController(
+        max_concurrent=args.clients, max_queue=args.clients
+    )
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def rss_kb(pid: int) -> int:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1])
+    return 0
+
+
+async def stream_chat(client: httpx.AsyncClient) -> dict:
+    started = time.perf_counter()
+    first_token = None
+    frames = 0
+
+    async with client.stream("POST", "/chat", json={"message": "hello"}) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            data = json.loads(line[6:])
+            if data["type"] == "token":
+                frames += 1
+                if first_token is None:
+                    first_token = time.perf_counter()
+
+    finished = time.perf_counter()
+    return {
+        "ttft": (first_token or finished) - started,
+        "latency": finished - started,
+        "streaming": finished - (first_token or finished),
+        "frames": frames,
+    }
+
+
+async def run_load(args: argparse.Namespace, pid: int) -> dict:
+    from main import percentile_ms
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.clients)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=None
+    ) as client:
+        for _ in range(100):
+            try:
+                await client.get("/stats")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+
+        # Warm up imports and the agent cache before taking the baseline
+        await stream_chat(client)
+        baseline = peak = rss_kb(pid)
+
+        async def sample_rss():
+            nonlocal peak
+            while True:
+                peak = max(peak, rss_kb(pid))
+                await asyncio.sleep(0.05)
+
+        sampler = asyncio.create_task(sample_rss())
+        results = []
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            for _ in range(args.rounds):
+                try:
+                    results.append(await stream_chat(client))
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.clients)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+        stats = (await client.get("/stats")).json()
+
+    ttft = [r["ttft"] for r in results]
+    latency = [r["latency"] for r in results]
+    per_stream_rate = [
+        args.tokens / r["streaming"] for r in results if r["streaming"] > 0
+    ]
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "ttft_ms": {
+            "p50": percentile_ms(ttft, 0.50),
+            "p95": percentile_ms(ttft, 0.95),
+            "p99": percentile_ms(ttft, 0.99),
+        },
+        "latency_ms": {
+            "p50": percentile_ms(latency, 0.50),
+            "p95": percentile_ms(latency, 0.95),
+            "p99": percentile_ms(latency, 0.99),
+        },
+        "tokens_per_sec": {
+            "per_stream": round(sum(per_stream_rate) / len(per_stream_rate), 1)
+            if per_stream_rate
+            else 0,
+            "aggregate": round(len(results) * args.tokens / elapsed, 1),
+        },
+        "frames_per_stream": round(sum(r["frames"] for r in results) / len(results), 1)
+        if results
+        else 0,
+        "rss_kb": {
+            "baseline": baseline,
+            "peak": peak,
+            "per_stream": round((peak - baseline) / args.clients, 1),
+        },
+        "server": stats,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-rate", type=float, default=100)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--flush-ms", type=int, default=50)
+    parser.add_argument("--flush-bytes", type=int, default=512)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    # spawn keeps the server process free of the client's state
+    ctx = multiprocessing.get_context("spawn")
+    server = ctx.Process(target=serve, args=(args,), daemon=True)
+    server.start()
+    try:
+        report = asyncio.run(run_load(args, server.pid))
+    finally:
+        server.terminate()
+        server.join()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
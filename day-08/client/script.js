@@ -85,6 +85,14 @@ class ChatAgent {
                 })
             });
 
+            if (response.status === 429 || response.status === 503) {
+                const retryAfter = response.headers.get('Retry-After') || 'a few';
+                this.addMessage(`The server is busy, please try again in ${retryAfter} seconds.`, 'system');
+                this.status.textContent = 'Server busy';
+                this.status.className = 'status error';
+                return;
+            }
+
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
@@ -113,6 +121,10 @@ class ChatAgent {
         // Initialize streaming message container
         this.currentStreamingMessage = this.createStreamingMessage();
 
+        // Token frames carry several coalesced tokens, so a single frame can
+        // span multiple reads. Keep the trailing partial line until it completes.
+        let buffer = '';
+
         try {
             while (true) {
                 const { done, value } = await reader.read();
@@ -120,26 +132,33 @@ class ChatAgent {
                 if (done) break;
 
                 // Decode the chunk
-                const chunk = decoder.decode(value, { stream: true });
-                const lines = chunk.split('\n');
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
 
                 for (const line of lines) {
-                    if (line.startsWith('data: ')) {
-                        try {
-                            const data = JSON.parse(line.slice(6));
-                            this.handleStreamEvent(data);
-                        } catch (e) {
-                            console.warn('Failed to parse JSON:', line, e);
-                        }
-                    }
+                    this.handleStreamLine(line);
                 }
             }
+
+            this.handleStreamLine(buffer + decoder.decode());
         } finally {
             reader.releaseLock();
             this.finalizeStreamingMessage();
         }
     }
 
+    handleStreamLine(line) {
+        if (!line.startsWith('data: ')) return;
+
+        try {
+            const data = JSON.parse(line.slice(6));
+            this.handleStreamEvent(data);
+        } catch (e) {
+            console.warn('Failed to parse JSON:', line, e);
+        }
+    }
+
     handleStreamEvent(data) {
         switch (data.type) {
             case 'start':
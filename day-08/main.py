@@ -1,16 +1,225 @@
+import asyncio
+import hashlib
 import json
+import time
+import weakref
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from openai.types.responses import ResponseTextDeltaEvent
 from pydantic import BaseModel
 
-from agents import Agent, ItemHelpers, Runner
-from config import with_env
+from agents import Agent, ItemHelpers, Model, Runner, StreamEvent
+from config import load_env
 
-app = FastAPI()
+AGENT_CACHE_SIZE = 128
+
+# Token deltas are merged into a single frame and flushed every
+# FLUSH_INTERVAL_MS or once FLUSH_MAX_BYTES are buffered, whichever comes first.
+# Set FLUSH_INTERVAL_MS to 0 to send one frame per token.
+FLUSH_INTERVAL_MS = 50
+FLUSH_MAX_BYTES = 512
+
+# At most MAX_CONCURRENT_RUNS agent runs stream at once. Up to MAX_QUEUED_RUNS
+# further requests wait for a slot for QUEUE_TIMEOUT_SECONDS, anything beyond
+# that is rejected immediately.
+MAX_CONCURRENT_RUNS = 32
+MAX_QUEUED_RUNS = 64
+QUEUE_TIMEOUT_SECONDS = 10.0
+RETRY_AFTER_SECONDS = 2
+
+# Rough size of a token, used to estimate how much of a cancelled run was
+# already streamed
+CHARS_PER_TOKEN = 4
+
+
+class AgentRegistry:
+    """
+    Bounded LRU cache of agents keyed by a hash of their name and instructions.
+    Agents are immutable once built, so the same instance can serve every
+    request that asks for the same configuration.
+    """
+
+    def __init__(self, max_size: int = AGENT_CACHE_SIZE, model: Model | None = None):
+        self.max_size = max_size
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self._agents: OrderedDict[str, Agent] = OrderedDict()
+
+    @staticmethod
+    def key(name: str, instructions: str) -> str:
+        return hashlib.sha256(f"{name}\0{instructions}".encode()).hexdigest()
+
+    def get(self, name: str, instructions: str) -> Agent:
+        key = self.key(name, instructions)
+        agent = self._agents.get(key)
+        if agent is not None:
+            self.hits += 1
+            self._agents.move_to_end(key)
+            return agent
+
+        self.misses += 1
+        agent = Agent(name=name, instructions=instructions, model=self.model)
+        self._agents[key] = agent
+        if len(self._agents) > self.max_size:
+            self._agents.popitem(last=False)
+        return agent
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._agents),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def percentile_ms(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of durations in seconds, reported in milliseconds."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * q))
+    return round(ordered[index] * 1000, 2)
+
+
+class RunSlot:
+    """A held admission slot. Releasing it more than once is a no-op."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._controller._release()
+
+
+class AdmissionController:
+    """
+    Caps concurrent agent runs and keeps a bounded queue of waiting requests.
+    A full queue is rejected with 429, a request that waits longer than
+    queue_timeout is rejected with 503. Both carry a Retry-After header.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = MAX_CONCURRENT_RUNS,
+        max_queue: int = MAX_QUEUED_RUNS,
+        queue_timeout: float = QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waits: deque[float] = deque(maxlen=1000)
+
+    async def acquire(self) -> RunSlot:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many queued requests",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except TimeoutError:
+            self.timed_out += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Timed out waiting for a free run slot",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            ) from None
+        finally:
+            self.waiting -= 1
+
+        self._waits.append(time.perf_counter() - started)
+        self.admitted += 1
+        self.running += 1
+        return RunSlot(self)
+
+    def _release(self) -> None:
+        self.running -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        waits = list(self._waits)
+        return {
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_ms_p50": percentile_ms(waits, 0.50),
+            "wait_ms_p95": percentile_ms(waits, 0.95),
+            "wait_ms_max": percentile_ms(waits, 1.0),
+        }
+
+
+class RunMetrics:
+    """
+    Counts finished and cancelled runs. Tokens saved by a cancellation are
+    estimated as the average output of a completed run minus what the
+    cancelled run had already streamed.
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.cancelled = 0
+        self.output_tokens = 0
+        self.tokens_saved = 0
+
+    def record_completed(self, output_tokens: int) -> None:
+        self.completed += 1
+        self.output_tokens += output_tokens
+
+    def record_cancelled(self, streamed_chars: int) -> None:
+        self.cancelled += 1
+        if self.completed:
+            expected = self.output_tokens / self.completed
+            streamed = streamed_chars / CHARS_PER_TOKEN
+            self.tokens_saved += max(0, round(expected - streamed))
+
+    def stats(self) -> dict:
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "tokens_saved": self.tokens_saved,
+        }
+
+
+agents = AgentRegistry()
+admission = AdmissionController()
+runs = RunMetrics()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load .env once per process instead of once per request
+    load_env()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,10 +244,25 @@ async def index():
         return HTMLResponse(content=f.read())
 
 
+@app.get("/stats")
+async def stats():
+    return {
+        "agents": agents.stats(),
+        "admission": admission.stats(),
+        "runs": runs.stats(),
+    }
+
+
 @app.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
+    slot = await admission.acquire()
+    stream = generate(request, http_request, slot)
+    # generate() releases the slot when it finishes, but a stream that is
+    # dropped before it starts never runs its finally block
+    weakref.finalize(stream, slot.release)
+
     return StreamingResponse(
-        generate(request),
+        stream,
         media_type="text/plain",
         headers={
             "Cache-Control": "no-cache",
@@ -47,55 +271,163 @@ async def chat(request: ChatRequest):
     )
 
 
-@with_env
-async def generate(request: ChatRequest):
-    agent = Agent(
-        name=request.agent_name,
-        instructions=request.agent_instructions,
-    )
+async def coalesce_tokens(
+    events: AsyncIterator[StreamEvent],
+    interval_ms: int = FLUSH_INTERVAL_MS,
+    max_bytes: int = FLUSH_MAX_BYTES,
+    stop: asyncio.Future | None = None,
+) -> AsyncIterator[StreamEvent | str]:
+    """
+    Merge consecutive text deltas into strings, passing every other event
+    through. Raw response events that are not text deltas are dropped.
+    Buffered text is flushed before the next non-token event, when the
+    interval elapses (even if the model is idle) or when max_bytes is reached.
+    Iteration ends without flushing as soon as `stop` is done.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = aiter(events)
+    buffer: list[str] = []
+    size = 0
+    deadline: float | None = None
+    pending: asyncio.Future | None = None
 
-    result = Runner.run_streamed(
-        agent,
-        input=request.message,
-    )
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(iterator))
+
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            waiting = {pending} if stop is None else {pending, stop}
+            done, _ = await asyncio.wait(
+                waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if stop is not None and stop.done():
+                return
+            if not done:
+                # Flush interval elapsed while waiting for the next event
+                yield "".join(buffer)
+                buffer.clear()
+                size, deadline = 0, None
+                continue
+
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
 
-    # Send start signal
-    data = json.dumps({"type": "start"})
-    yield f"data: {data}\n\n"
+            if event.type == "raw_response_event":
+                if not isinstance(event.data, ResponseTextDeltaEvent):
+                    continue
+                token = event.data.delta
+                if not token:
+                    continue
+                if interval_ms <= 0:
+                    yield token
+                    continue
 
-    async for event in result.stream_events():
-        if event.type == "raw_response_event":
-            if not isinstance(event.data, ResponseTextDeltaEvent):
+                buffer.append(token)
+                size += len(token.encode())
+                if deadline is None:
+                    deadline = loop.time() + interval_ms / 1000
+                if size >= max_bytes:
+                    yield "".join(buffer)
+                    buffer.clear()
+                    size, deadline = 0, None
                 continue
-            token = event.data.delta
-            if token:
-                data = json.dumps({"type": "token", "content": token})
-                yield f"data: {data}\n\n"
 
-        elif event.type == "agent_updated_stream_event":
-            data = json.dumps(
-                {"type": "agent_update", "agent_name": event.new_agent.name}
-            )
-            yield f"data: {data}\n\n"
+            if buffer:
+                yield "".join(buffer)
+                buffer.clear()
+                size, deadline = 0, None
+            yield event
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            # The source may swallow the cancellation and finish on its own
+            pending.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+async def wait_for_disconnect(http_request: Request) -> None:
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def generate(request: ChatRequest, http_request: Request, slot: RunSlot):
+    result = None
+    streamed_chars = 0
+    disconnected = asyncio.create_task(wait_for_disconnect(http_request))
+
+    try:
+        agent = agents.get(request.agent_name, request.agent_instructions)
 
-        elif event.type == "run_item_stream_event":
-            if event.item.type == "tool_call_item":
-                data = json.dumps({"type": "tool_call", "message": "Tool was called"})
+        result = Runner.run_streamed(
+            agent,
+            input=request.message,
+        )
+
+        # Send start signal
+        data = json.dumps({"type": "start"})
+        yield f"data: {data}\n\n"
+
+        events = coalesce_tokens(
+            result.stream_events(),
+            interval_ms=FLUSH_INTERVAL_MS,
+            max_bytes=FLUSH_MAX_BYTES,
+            stop=disconnected,
+        )
+        async for event in events:
+            if isinstance(event, str):
+                streamed_chars += len(event)
+                data = json.dumps({"type": "token", "content": event})
                 yield f"data: {data}\n\n"
-            elif event.item.type == "tool_call_output_item":
+
+            elif event.type == "agent_updated_stream_event":
                 data = json.dumps(
-                    {"type": "tool_output", "content": str(event.item.output)}
+                    {"type": "agent_update", "agent_name": event.new_agent.name}
                 )
                 yield f"data: {data}\n\n"
 
-            elif event.item.type == "message_output_item":
-                message_text = ItemHelpers.text_message_output(event.item)
-                data = json.dumps({"type": "message_replace", "content": message_text})
-                yield f"data: {data}\n\n"
+            elif event.type == "run_item_stream_event":
+                if event.item.type == "tool_call_item":
+                    data = json.dumps(
+                        {"type": "tool_call", "message": "Tool was called"}
+                    )
+                    yield f"data: {data}\n\n"
+                elif event.item.type == "tool_call_output_item":
+                    data = json.dumps(
+                        {"type": "tool_output", "content": str(event.item.output)}
+                    )
+                    yield f"data: {data}\n\n"
+
+                elif event.item.type == "message_output_item":
+                    message_text = ItemHelpers.text_message_output(event.item)
+                    data = json.dumps(
+                        {"type": "message_replace", "content": message_text}
+                    )
+                    yield f"data: {data}\n\n"
+
+        if disconnected.done():
+            return
+
+        runs.record_completed(result.context_wrapper.usage.output_tokens)
 
-    # Send completion signal
-    data = json.dumps({"type": "complete"})
-    yield f"data: {data}\n\n"
+        # Send completion signal
+        data = json.dumps({"type": "complete"})
+        yield f"data: {data}\n\n"
+    finally:
+        disconnected.cancel()
+        # Nobody is reading anymore, stop paying for tokens
+        if result is not None and not result.is_complete:
+            result.cancel()
+            runs.record_cancelled(streamed_chars)
+        slot.release()
 
 
 if __name__ == "__main__":
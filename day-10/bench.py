@@ -0,0 +1,89 @@
+"""
+Session storage benchmark for the bot: messages/sec with a fresh
+SQLiteSession per message (before) versus PooledSQLiteSession on a shared
+SQLitePool (after) and the WriteBehindStore, which serves reads from memory
+and group-commits writes.
+
+Each simulated message does what Runner.run does with a session: read the
+history, then append the user message and the assistant reply. Chats run
+concurrently, like updates from many users. Run it from this directory:
+
+    python bench.py --chats 20 --messages 50
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from agents import SQLiteSession
+from common import PooledSQLiteSession, SQLitePool, WriteBehindStore
+
+
+async def simulate_chat(get_session, chat_id: int, messages: int) -> None:
+    for i in range(messages):
+        session = get_session(f"chat_{chat_id}")
+        await session.get_items()
+        await session.add_items(
+            [
+                {"role": "user", "content": f"message {i} from chat {chat_id}"},
+                {
+                    "id": "__fake_id__",
+                    "content": [
+                        {"annotations": [], "text": "reply", "type": "output_text"}
+                    ],
+                    "role": "assistant",
+                    "status": "completed",
+                    "type": "message",
+                },
+            ]
+        )
+
+
+async def measure(get_session, chats: int, messages: int) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(simulate_chat(get_session, chat_id, messages) for chat_id in range(chats))
+    )
+    return chats * messages / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_db = Path(tmp) / "before.sql"
+        before = await measure(
+            lambda session_id: SQLiteSession(session_id, before_db),
+            args.chats,
+            args.messages,
+        )
+
+        pool = SQLitePool(Path(tmp) / "after.sql", size=args.pool_size)
+        after = await measure(
+            lambda session_id: PooledSQLiteSession(session_id, pool),
+            args.chats,
+            args.messages,
+        )
+        pool.close()
+
+        store = WriteBehindStore(SQLitePool(Path(tmp) / "write_behind.sql"))
+        write_behind = await measure(store.get, args.chats, args.messages)
+        await store.close()
+        store.pool.close()
+
+    print(f"chats: {args.chats}, messages per chat: {args.messages}")
+    print(f"before (SQLiteSession per message): {before:8.1f} messages/sec")
+    print(f"after  (PooledSQLiteSession):       {after:8.1f} messages/sec")
+    print(f"after  (WriteBehindStore):          {write_behind:8.1f} messages/sec")
+    print(f"speedup: {after / before:.1f}x pooled")
+    print(f"speedup: {write_behind / before:.1f}x write-behind")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
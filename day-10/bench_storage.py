@@ -0,0 +1,128 @@
+"""
+Storage format benchmark: bytes per item and read throughput of the JSON text
+rows written by SQLiteSession versus the compact zstd format (see
+common/codec.py), on a generated history shaped like the bot's.
+
+The zstd database is produced by migrating a copy of the JSON one, the same
+way `python -m common.migrate bot.sql` does. Run it from this directory:
+
+    python bench_storage.py --chats 200 --turns 20
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from common import PooledSQLiteSession, SQLitePool
+from common.migrate import migrate, stored_bytes, train
+
+WORDS = (
+    "the weather today is clear sunny hot humid in Tel Aviv Jerusalem Haifa "
+    "Eilat with temperatures around 36.9°C feels like 40.2°C — plan "
+    "accordingly it’s a good day for the beach but drink plenty of water "
+    "please remind me tomorrow about my meeting and the report deadline"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def turn(rng: random.Random, chat_id: int, i: int) -> list[dict]:
+    items: list[dict] = [{"role": "user", "content": sentence(rng, rng.randint(5, 30))}]
+    if rng.random() < 0.3:
+        call_id = f"call_{chat_id}_{i}_{rng.getrandbits(64):x}"
+        items += [
+            {
+                "arguments": f'{{"location": {{"lat": {rng.uniform(29, 33):.4f}, '
+                f'"long": {rng.uniform(34, 36):.4f}}}}}',
+                "call_id": call_id,
+                "name": "fetch_weather",
+                "type": "function_call",
+                "id": "__fake_id__",
+            },
+            {
+                "call_id": call_id,
+                "output": sentence(rng, rng.randint(20, 60)),
+                "type": "function_call_output",
+            },
+        ]
+    items.append(
+        {
+            "id": "__fake_id__",
+            "content": [
+                {
+                    "annotations": [],
+                    "text": sentence(rng, rng.randint(20, 120)),
+                    "type": "output_text",
+                }
+            ],
+            "role": "assistant",
+            "status": "completed",
+            "type": "message",
+        }
+    )
+    return items
+
+
+async def fill(pool: SQLitePool, chats: int, turns: int) -> None:
+    rng = random.Random(0)
+    for chat_id in range(chats):
+        session = PooledSQLiteSession(f"chat_{chat_id}", pool)
+        for i in range(turns):
+            await session.add_items(turn(rng, chat_id, i))
+
+
+async def read_all(pool: SQLitePool, chats: int, rounds: int) -> float:
+    """Items per second read back through PooledSQLiteSession.get_items()."""
+    items = 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for chat_id in range(chats):
+            session = PooledSQLiteSession(f"chat_{chat_id}", pool)
+            items += len(await session.get_items())
+    return items / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_db = Path(tmp) / "json.sql"
+        zstd_db = Path(tmp) / "zstd.sql"
+
+        pool = SQLitePool(json_db)
+        await fill(pool, args.chats, args.turns)
+        rows, json_bytes = stored_bytes(pool)
+        json_rate = await read_all(pool, args.chats, args.rounds)
+        pool.close()
+
+        shutil.copy(json_db, zstd_db)
+        pool = SQLitePool(zstd_db, storage_format="zstd")
+        started = time.perf_counter()
+        dict_id = train(pool, samples=5000, size=16 * 1024)
+        migrate(pool, batch_size=500, reencode=False)
+        migration = time.perf_counter() - started
+        _, zstd_bytes = stored_bytes(pool)
+        zstd_rate = await read_all(pool, args.chats, args.rounds)
+        pool.close()
+
+    print(f"items: {rows} in {args.chats} chats, dictionary: {dict_id}")
+    print(f"json: {json_bytes / rows:7.1f} bytes/item {json_rate:10.0f} items/sec read")
+    print(f"zstd: {zstd_bytes / rows:7.1f} bytes/item {zstd_rate:10.0f} items/sec read")
+    print(
+        f"size: {zstd_bytes / json_bytes:.0%} of json, "
+        f"reads: {zstd_rate / json_rate:.2f}x, migration took {migration:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
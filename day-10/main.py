@@ -1,54 +1,215 @@
+import asyncio
 import os
-import sqlite3
+import time
+from collections.abc import Awaitable
 from datetime import timedelta
+from typing import Any
 
-from telegram import ForceReply, Update
-from telegram.constants import ChatAction
+from openai.types.responses import ResponseTextDeltaEvent
+from telegram import ForceReply, Message, Update
+from telegram.constants import ChatAction, ChatType, MessageLimit
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CommandHandler,
     ContextTypes,
     MessageHandler,
     filters,
 )
 
-from agents import Agent, Runner, SQLiteSession
+from agents import Agent, Runner
+from common import (
+    CompactingSession,
+    SessionPruner,
+    SQLitePool,
+    WriteBehindStore,
+)
 from config import with_env
 
 FIRST = timedelta(seconds=10)
 INTERVAL = timedelta(minutes=5)
-KEEP_LAST_N = 10
+# The model sees the newest history that fits in HISTORY_TOKEN_BUDGET tokens,
+# KEEP_LAST_N only caps how many rows are stored per chat
+HISTORY_TOKEN_BUDGET = 4000
+KEEP_LAST_N = 200
 DB_PATH = "bot.sql"
+# History is served from memory and written to DB_PATH in one transaction per
+# FLUSH_INTERVAL seconds; "buffered" may lose that last interval on a crash,
+# "committed" makes every reply wait for its batch to be written
+FLUSH_INTERVAL = 0.1
+DURABILITY = "buffered"
+# New items are stored as JSON text. "zstd" stores about a quarter of the
+# bytes but reads about 0.6x as fast (bench_storage.py), only worth it when
+# the file size matters; `python -m common.migrate bot.sql` converts old rows
+STORAGE_FORMAT = "json"
 
+# Updates from different chats run in parallel up to MAX_CONCURRENT_RUNS,
+# at most MAX_PENDING_UPDATES may be waiting or running at once.
+MAX_CONCURRENT_RUNS = 8
+MAX_PENDING_UPDATES = 256
 
-async def prune_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+# Replies are streamed by editing a placeholder message. Telegram allows about
+# one edit per second in private chats and 20 messages per minute in groups;
+# the interval grows when we get flood-limited and shrinks back on success.
+STREAM_REPLIES = True
+PLACEHOLDER = "…"
+PRIVATE_EDIT_INTERVAL = 1.0
+GROUP_EDIT_INTERVAL = 3.0
+MAX_EDIT_INTERVAL = 10.0
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
     """
-    Keep only the last `keep_n` rows in agent_messages for *each* session_id.
-    Uses a single DELETE with a window function.
+    Processes updates concurrently while keeping each chat strictly ordered.
+
+    An update first waits for its chat's lock (asyncio locks are FIFO, so
+    messages keep their arrival order and session history never interleaves)
+    and only then takes one of the `max_concurrent_runs` slots, so a busy chat
+    queues behind itself without holding slots other chats could use.
+    Commands don't touch the history and run right away, so /stats can report
+    on a chat while its turn is still running.
     """
 
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute("PRAGMA foreign_keys = ON")
-        conn.execute("""
-            CREATE INDEX IF NOT EXISTS idx_agent_messages_session_time
-            ON agent_messages(session_id, created_at, id)
-        """)
-        conn.execute(
-            """
-            WITH ranked AS (
-              SELECT id,
-                     ROW_NUMBER() OVER (
-                       PARTITION BY session_id
-                       ORDER BY created_at DESC, id DESC
-                     ) AS rn
-              FROM agent_messages
-            )
-            DELETE FROM agent_messages
-            WHERE id IN (SELECT id FROM ranked WHERE rn > ?);
-            """,
-            (KEEP_LAST_N,),
+    def __init__(
+        self,
+        max_concurrent_runs: int = MAX_CONCURRENT_RUNS,
+        max_pending_updates: int = MAX_PENDING_UPDATES,
+    ):
+        super().__init__(max_pending_updates)
+        self.in_flight = 0
+        self._runs = asyncio.Semaphore(max_concurrent_runs)
+        self._chat_locks: dict[int, asyncio.Lock] = {}
+        self._chat_depths: dict[int, int] = {}
+
+    def queue_depth(self, chat_id: int) -> int:
+        """Updates of this chat that are waiting or running."""
+        return self._chat_depths.get(chat_id, 0)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await self._run(coroutine)
+            return
+        if filters.COMMAND.check_update(update):
+            await coroutine
+            return
+
+        lock = self._chat_locks.setdefault(chat.id, asyncio.Lock())
+        self._chat_depths[chat.id] = self._chat_depths.get(chat.id, 0) + 1
+        try:
+            async with lock:
+                await self._run(coroutine)
+        finally:
+            self._chat_depths[chat.id] -= 1
+            if not self._chat_depths[chat.id]:
+                del self._chat_depths[chat.id]
+                del self._chat_locks[chat.id]
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        async with self._runs:
+            self.in_flight += 1
+            try:
+                await coroutine
+            finally:
+                self.in_flight -= 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class ThrottledReply:
+    """
+    A reply that grows by editing a Telegram message at a flood-safe pace.
+    Text beyond Telegram's message length limit continues in a new message.
+    """
+
+    def __init__(self, message: Message, min_interval: float):
+        self.message = message
+        self.min_interval = min_interval
+        self.interval = min_interval
+        self._offset = 0
+        self._shown = PLACEHOLDER
+        self._next_edit = time.monotonic() + min_interval
+
+    @classmethod
+    async def start(cls, update: Update) -> "ThrottledReply":
+        is_private = update.effective_chat.type == ChatType.PRIVATE
+        message = await update.message.reply_text(PLACEHOLDER)
+        return cls(
+            message, PRIVATE_EDIT_INTERVAL if is_private else GROUP_EDIT_INTERVAL
         )
-        conn.execute("PRAGMA optimize")
+
+    async def update(self, text: str) -> None:
+        """Show `text` if the edit interval has passed, otherwise skip."""
+        await self._split(text)
+        if time.monotonic() < self._next_edit:
+            return
+
+        try:
+            await self._edit(text[self._offset :])
+        except RetryAfter as e:
+            self.interval = min(MAX_EDIT_INTERVAL, self.interval * 2)
+            self._next_edit = time.monotonic() + max(self.interval, _seconds(e))
+            return
+
+        self.interval = max(self.min_interval, self.interval * 0.8)
+        self._next_edit = time.monotonic() + self.interval
+
+    async def finish(self, text: str) -> None:
+        """Show the final `text`, waiting out flood limits if needed."""
+        await self._split(text)
+        while True:
+            try:
+                await self._edit(text[self._offset :].strip() or PLACEHOLDER)
+                return
+            except RetryAfter as e:
+                await asyncio.sleep(_seconds(e))
+
+    async def _split(self, text: str) -> None:
+        limit = MessageLimit.MAX_TEXT_LENGTH
+        while len(text) - self._offset > limit:
+            await self.finish(text[: self._offset + limit])
+            self._offset += limit
+            self.message = await self.message.reply_text(PLACEHOLDER)
+            self._shown = PLACEHOLDER
+
+    async def _edit(self, text: str) -> None:
+        # Telegram strips leading and trailing whitespace: a whitespace-only
+        # delta doesn't modify the message and empty text is rejected
+        text = text.strip()
+        if not text or text == self._shown:
+            return
+        try:
+            await self.message.edit_text(text)
+        except BadRequest as e:
+            if "message is not modified" not in e.message.lower():
+                raise
+        self._shown = text
+
+
+def _seconds(error: RetryAfter) -> float:
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+async def prune_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Keep only the last `KEEP_LAST_N` rows in agent_messages for each session
+    that received messages since the previous run.
+    """
+
+    pruner: SessionPruner = context.bot_data["pruner"]
+    stats = await pruner.run_pass()
+    print(
+        f"pruned {stats.rows_deleted} rows from {stats.sessions} sessions "
+        f"in {stats.seconds * 1000:.1f}ms"
+    )
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -61,14 +222,26 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     )
 
 
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Report this chat's queue depth and the number of runs in flight."""
+
+    processor: PerChatUpdateProcessor = context.application.update_processor
+    await update.message.reply_text(
+        f"queued in this chat: {processor.queue_depth(update.effective_chat.id)}\n"
+        f"runs in flight: {processor.in_flight}"
+    )
+
+
 async def answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Answer the user message."""
 
     chat_id = update.effective_chat.id
     session_id = f"chat_{chat_id}"
-    session = SQLiteSession(session_id, "bot.sql")
-
-    await update.message.reply_chat_action(ChatAction.TYPING)
+    if "session" not in context.chat_data:
+        context.chat_data["session"] = CompactingSession(
+            context.bot_data["sessions"].get(session_id)
+        )
+    session = context.chat_data["session"]
 
     if "agent" not in context.chat_data:
         context.chat_data["agent"] = Agent(
@@ -77,19 +250,61 @@ async def answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         )
     agent = context.chat_data["agent"]
 
-    result = await Runner.run(agent, update.message.text, session=session)
-    await update.message.reply_text(result.final_output)
+    if not STREAM_REPLIES:
+        await update.message.reply_chat_action(ChatAction.TYPING)
+        result = await Runner.run(agent, update.message.text, session=session)
+        await update.message.reply_text(result.final_output)
+    else:
+        reply = await ThrottledReply.start(update)
+        result = Runner.run_streamed(agent, update.message.text, session=session)
+
+        text = ""
+        async for event in result.stream_events():
+            if event.type == "raw_response_event" and isinstance(
+                event.data, ResponseTextDeltaEvent
+            ):
+                text += event.data.delta
+                await reply.update(text)
+
+        await reply.finish(str(result.final_output))
+
+    # Summarize older turns after the user already has the reply
+    session.schedule_compaction()
+
+
+async def post_shutdown(application: Application) -> None:
+    await application.bot_data["sessions"].close()
+    application.bot_data["sessions"].pool.close()
 
 
 @with_env
 def main() -> None:
     token = os.environ["TELEGRAM_BOT_TOKEN"]
-    application = Application.builder().token(token).build()
+    application = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(PerChatUpdateProcessor())
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+
+    # One connection pool and one write-behind store for the whole bot,
+    # shared with prune_job so they don't fight over the database file
+    sessions = WriteBehindStore(
+        SQLitePool(DB_PATH, storage_format=STORAGE_FORMAT),
+        flush_interval=FLUSH_INTERVAL,
+        durability=DURABILITY,
+        token_budget=HISTORY_TOKEN_BUDGET,
+    )
+    application.bot_data["sessions"] = sessions
+    application.bot_data["pruner"] = SessionPruner(sessions.pool, KEEP_LAST_N)
 
     start_handler = CommandHandler("start", start)
+    stats_handler = CommandHandler("stats", stats)
     answer_handler = MessageHandler(filters.TEXT & ~filters.COMMAND, answer)
 
     application.add_handler(start_handler)
+    application.add_handler(stats_handler)
     application.add_handler(answer_handler)
 
     application.job_queue.run_repeating(
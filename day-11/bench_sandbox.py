@@ -0,0 +1,85 @@
+"""
+run_python dispatch benchmark: a fresh `python -I` process per snippet versus
+a warm SandboxPool, one snippet at a time and many at once like concurrent
+agent runs. Run it from this directory:
+
+    python bench_sandbox.py --jobs 200 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from common import SandboxPool
+
+SNIPPET = "result = sum(i * i for i in range(1000))"
+
+
+async def fresh_process(code: str) -> str:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-I",
+        "-c",
+        f"{code}\nprint(result)",
+        stdout=asyncio.subprocess.PIPE,
+        env={},
+    )
+    stdout, _ = await process.communicate()
+    return stdout.decode().strip()
+
+
+async def pooled(pool: SandboxPool, code: str) -> str:
+    return (await pool.run(code)).result
+
+
+async def measure(name: str, run, jobs: int, concurrency: int) -> None:
+    latencies = []
+    for _ in range(jobs // 4):
+        started = time.perf_counter()
+        await run(SNIPPET)
+        latencies.append(time.perf_counter() - started)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await run(SNIPPET)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(jobs)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(
+        f"{name:14} p50 {statistics.median(latencies) * 1000:6.2f}ms "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.2f}ms, "
+        f"{jobs / elapsed:7.0f} jobs/s at concurrency {concurrency}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    await measure("fresh process", fresh_process, args.jobs, args.concurrency)
+
+    pool = SandboxPool()
+    await pool.start()
+    try:
+        await measure(
+            "sandbox pool",
+            lambda code: pooled(pool, code),
+            args.jobs,
+            args.concurrency,
+        )
+        print(pool.stats())
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
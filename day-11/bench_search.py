@@ -0,0 +1,77 @@
+"""
+Web search tool benchmark against FakeSearchBackend: the old tavily_search
+(a search per call, raw results returned verbatim) versus search_web (results
+cached on disk by normalized query, compacted to a token budget).
+
+Each round asks a handful of queries with different case and spacing, like a
+model rephrasing the same search. Run it from this directory:
+
+    python bench_search.py --rounds 10 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from common import FakeSearchBackend, SearchCache, count_tokens, search_web
+
+QUERIES = [
+    "best coffee shop in Tel Aviv",
+    "weather today in Tel Aviv",
+    "coffee shop address Rothschild boulevard",
+]
+
+
+def queries(rounds: int) -> list[str]:
+    variants = [str, str.lower, str.upper, lambda q: f"  {q.replace(' ', '  ')} "]
+    return [
+        variants[i % len(variants)](query) for i in range(rounds) for query in QUERIES
+    ]
+
+
+async def before(backend: FakeSearchBackend, batch: list[str]) -> int:
+    tokens = 0
+    for query in batch:
+        response = await backend.search(query, max_results=5)
+        tokens += count_tokens(str(response["results"]))
+    return tokens
+
+
+async def after(backend: FakeSearchBackend, batch: list[str], db_path: str) -> int:
+    cache = SearchCache(db_path)
+    tokens = 0
+    for query in batch:
+        tokens += count_tokens(await search_web(query, backend, cache))
+    cache.close()
+    return tokens
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    batch = queries(args.rounds)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "search.sql")
+        for name, run in [
+            ("before", lambda backend: before(backend, batch)),
+            ("after", lambda backend: after(backend, batch, db_path)),
+            # A restart keeps the cache
+            ("after, warm", lambda backend: after(backend, batch, db_path)),
+        ]:
+            backend = FakeSearchBackend(args.latency)
+            started = time.perf_counter()
+            tokens = await run(backend)
+            elapsed = time.perf_counter() - started
+            print(
+                f"{name:12} {len(batch)} searches: {backend.calls:3} backend calls, "
+                f"{tokens / len(batch):6.0f} tokens/result, {elapsed:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,8 +1,13 @@
 import asyncio
+import os
 
-from agents import Agent, CodeInterpreterTool, Runner
+from agents import Agent, CodeInterpreterTool, Runner, function_tool
+from common import SandboxPool
 from config import with_env
 
+# "local" runs code in local sandboxed worker processes instead
+CODE_RUNNER = os.environ.get("CODE_RUNNER", "hosted")
+
 # NOT SECURE SOLUTION:
 
 # @function_tool
@@ -42,12 +47,51 @@ agent = Agent(
 )
 
 
+# LOCAL SANDBOXED SOLUTION:
+# Warm worker processes with CPU, memory and wall-clock limits and no network,
+# no network round trip or container start per call.
+
+sandbox = SandboxPool()
+
+
+@function_tool
+async def run_python(code: str) -> str:
+    """Run provided python code and return the value of "result"
+    global variable as string, after anything the code printed.
+
+    Args:
+        code: python code to execute
+
+    Example input to return the value of 5 + 7:
+        x = 5
+        y = 7
+        result = x + y
+    """
+    print(f"Running Code: \n\n{code}")
+    result = await sandbox.run(code)
+    print(f"Result ({result.seconds * 1000:.1f}ms):\n{result}")
+    return str(result)
+
+
+local_agent = Agent(
+    name="Assistant",
+    tools=[run_python],
+)
+
+
 @with_env
 async def main():
-    result = await Runner.run(
-        agent, "What is the current os.name? use Python to find out"
-    )
-    print(result.final_output)
+    if CODE_RUNNER == "local":
+        # Start the workers now, not on the first tool call
+        await sandbox.start()
+    try:
+        result = await Runner.run(
+            local_agent if CODE_RUNNER == "local" else agent,
+            "What is the current os.name? use Python to find out",
+        )
+        print(result.final_output)
+    finally:
+        await sandbox.close()
 
 
 if __name__ == "__main__":
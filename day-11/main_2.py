@@ -1,11 +1,22 @@
 import asyncio
 import os
 
-from tavily import AsyncTavilyClient
-
 from agents import Agent, Runner, WebSearchTool, function_tool
+from common import (
+    FakeSearchBackend,
+    SearchCache,
+    close_tavily_client,
+    search_web,
+    tavily_client,
+)
 from config import with_env
 
+SEARCH_CACHE_PATH = "search.sql"
+
+# Opened on the first search, so importing this doesn't create the file
+search_cache: SearchCache | None = None
+fake_backend = FakeSearchBackend()
+
 # AGENT-SDK EXPENSIVE SOLUTION:
 
 agent = Agent(
@@ -26,17 +37,22 @@ async def tavily_search(query: str) -> str:
     Returns:
         Formatted search results with titles, URLs, and content snippets
     """
-    api_key = os.environ.get("TAVILY_API_KEY")
-    if not api_key:
-        return "Error: TAVILY_API_KEY environment variable not set"
-
-    client = AsyncTavilyClient(api_key=api_key)
-    response = await client.search(query, max_results=5)
+    # Read here, after with_env loaded .env; "fake" searches offline with
+    # made-up results
+    if os.environ.get("SEARCH_BACKEND", "tavily") == "fake":
+        backend = fake_backend
+    else:
+        api_key = os.environ.get("TAVILY_API_KEY")
+        if not api_key:
+            return "Error: TAVILY_API_KEY environment variable not set"
+        backend = tavily_client(api_key)
 
-    if not response or "results" not in response:
-        return "No results found"
+    global search_cache
+    if search_cache is None:
+        search_cache = SearchCache(SEARCH_CACHE_PATH)
 
-    return response["results"]
+    # Cached on disk by normalized query, trimmed to the best snippets
+    return await search_web(query, backend, search_cache)
 
 
 @with_env
@@ -47,6 +63,10 @@ async def main():
         today in Tel-Aviv? Also, please provide the address of the coffee shop.""",
     )
     print(result.final_output)
+    if search_cache is not None:
+        print(search_cache.stats())
+        search_cache.close()
+    await close_tavily_client()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,115 @@
+"""
+Weather tool benchmark against a local stub of the OpenWeather API: the old
+requests.get-in-an-executor call versus fetch_current_weather (shared
+keep-alive client, TTL cache on a coordinate grid).
+
+Every round asks for the four cities from main_1.py, each with a little jitter
+like a model rounding coordinates differently. The burst runs then send the
+same calls all at once on a cold cache, like parallel tool calls from several
+runs, with and without single_flight. Run it from this directory:
+
+    python bench_weather.py --rounds 20 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import functools
+import random
+import time
+
+import requests
+
+from common import (
+    close_http_client,
+    fetch_current_weather,
+    single_flight,
+    single_flight_stats,
+    weather_cache,
+)
+from common.weather_stub import WeatherStubServer
+
+CITIES = {
+    "Tel Aviv": (32.0853, 34.7818),
+    "Jerusalem": (31.7683, 35.2137),
+    "Haifa": (32.794, 34.9896),
+    "Eilat": (29.5577, 34.9519),
+}
+
+
+def lookups(rounds: int) -> list[tuple[float, float]]:
+    rng = random.Random(0)
+    return [
+        (lat + rng.uniform(-0.005, 0.005), long + rng.uniform(-0.005, 0.005))
+        for _ in range(rounds)
+        for lat, long in CITIES.values()
+    ]
+
+
+async def before(url: str, points: list[tuple[float, float]]) -> None:
+    loop = asyncio.get_event_loop()
+    for lat, long in points:
+        params = {"lat": lat, "lon": long, "appid": "stub", "units": "metric"}
+        response = await loop.run_in_executor(None, requests.get, url, params)
+        response.raise_for_status()
+
+
+async def after(url: str, points: list[tuple[float, float]]) -> None:
+    for lat, long in points:
+        await fetch_current_weather(lat, long, "stub", url)
+    await close_http_client()
+
+
+async def burst(url: str, points: list[tuple[float, float]], coalesce: bool) -> None:
+    async def fetch(lat: float, long: float) -> dict:
+        return await fetch_current_weather(lat, long, "stub", url)
+
+    if coalesce:
+        fetch = single_flight(fetch, name="burst")
+    weather_cache.clear()
+    await asyncio.gather(*(fetch(lat, long) for lat, long in points))
+    await close_http_client()
+
+
+def measure(server: WeatherStubServer, run, points) -> dict:
+    server.requests = server.connections = 0
+    started = time.perf_counter()
+    asyncio.run(run(server.url, points))
+    return {
+        "seconds": time.perf_counter() - started,
+        "requests": server.requests,
+        "connections": server.connections,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = WeatherStubServer(latency=args.latency).start()
+    points = lookups(args.rounds)
+    results = {
+        "before": measure(server, before, points),
+        "after": measure(server, after, points),
+    }
+    duplicates = list(CITIES.values()) * args.rounds
+    results["burst"] = measure(
+        server, functools.partial(burst, coalesce=False), duplicates
+    )
+    results["burst single-flight"] = measure(
+        server, functools.partial(burst, coalesce=True), duplicates
+    )
+    server.shutdown()
+
+    print(f"{len(points)} lookups, {args.latency * 1000:.0f}ms stub latency")
+    for name, r in results.items():
+        print(
+            f"{name:19}: {r['seconds']:6.2f}s, {r['requests']:3} requests "
+            f"on {r['connections']:3} connections"
+        )
+    print(f"single flight: {single_flight_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Many file manager runs in one event loop, each in its own directory.
+
+Every run changes into its own directory (relative to a shared start
+directory), searches it for a word only its own files contain and lists it.
+A scripted model issues the tool calls, with a little latency so the runs
+interleave. With os.chdir the runs would move each other around and find the
+wrong files; with the directory in the run context each must only ever see
+its own. Run it from this directory:
+
+    python concurrent_search.py --runs 100 --latency 0.01
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from main_3 import (
+    FileManagerContext,
+    change_directory,
+    files_tool_use_behavior,
+    list_directory_files,
+    search_files,
+)
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+)
+
+from agents import Agent, Model, ModelResponse, Runner, Usage, set_tracing_disabled
+from common import directory_cache
+
+
+class ToolScriptModel(Model):
+    """
+    A model that calls change_directory, search_files and list_directory_files
+    for the directory and word in the user message ("directory word"), then
+    answers with all the tool outputs.
+    """
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+
+    async def get_response(
+        self, system_instructions, input, *args, **kwargs
+    ) -> ModelResponse:
+        await asyncio.sleep(self.latency)
+        directory, word = input[0]["content"].split()
+        outputs = [
+            item["output"]
+            for item in input
+            if item.get("type") == "function_call_output"
+        ]
+        steps = [
+            ("change_directory", {"directory_path": directory}),
+            ("search_files", {"text": word}),
+            ("list_directory_files", {}),
+        ]
+
+        if len(outputs) < len(steps):
+            name, arguments = steps[len(outputs)]
+            output = ResponseFunctionToolCall(
+                arguments=json.dumps(arguments),
+                call_id=f"call_{len(outputs)}",
+                name=name,
+                type="function_call",
+            )
+        else:
+            output = ResponseOutputMessage(
+                id="msg_scripted",
+                content=[
+                    ResponseOutputText(
+                        annotations=[], text="\n".join(outputs), type="output_text"
+                    )
+                ],
+                role="assistant",
+                status="completed",
+                type="message",
+            )
+        return ModelResponse(output=[output], usage=Usage(requests=1), response_id=None)
+
+    async def stream_response(
+        self, system_instructions, input, *args, **kwargs
+    ) -> AsyncIterator:
+        # The same step as get_response, as a single completed event
+        response = await self.get_response(system_instructions, input)
+        yield ResponseCompletedEvent(
+            response=Response(
+                id="resp_scripted",
+                created_at=time.time(),
+                model="scripted",
+                object="response",
+                output=response.output,
+                parallel_tool_calls=False,
+                tool_choice="auto",
+                tools=[],
+            ),
+            sequence_number=0,
+            type="response.completed",
+        )
+
+
+def make_tree(root: Path, runs: int) -> None:
+    """run_<i>/notes/todo.txt mentions word_<i>, every run also gets a decoy."""
+    for i in range(runs):
+        notes = root / f"run_{i}" / "notes"
+        notes.mkdir(parents=True)
+        (notes / "todo.txt").write_text(f"remember word_{i}\n")
+        (notes / "readme.txt").write_text("nothing to see here\n")
+
+
+async def run_one(agent: Agent, root: Path, i: int) -> str | None:
+    """The run's output, or None if it saw only its own directory."""
+    context = FileManagerContext(cwd=root, root=root)
+    result = await Runner.run(agent, f"run_{i} word_{i}", context=context, max_turns=10)
+    output = result.final_output
+    own = root.resolve() / f"run_{i}"
+    expected = [
+        f"changed to directory: {own}",
+        f"lines containing 'word_{i}' under {own}:\nnotes/todo.txt:1: remember",
+        f"contents of directory {own}:\ndirectory: notes/",
+    ]
+    if context.cwd != own or any(line not in output for line in expected):
+        return output
+    return None
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    set_tracing_disabled(True)
+    agent = Agent(
+        name="File Manager",
+        model=ToolScriptModel(args.latency),
+        tools=[list_directory_files, search_files, change_directory],
+        tool_use_behavior=files_tool_use_behavior,
+    )
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        make_tree(root, args.runs)
+
+        started = time.perf_counter()
+        failures = await asyncio.gather(
+            *(run_one(agent, root, i) for i in range(args.runs))
+        )
+        elapsed = time.perf_counter() - started
+
+    failed = [(i, output) for i, output in enumerate(failures) if output is not None]
+    print(
+        f"{args.runs} runs in {elapsed:.2f}s "
+        f"({args.runs / elapsed:.0f} searches/s), {len(failed)} failed"
+    )
+    print(directory_cache.stats())
+    for i, output in failed[:3]:
+        print(f"\nrun {i}:\n{output}")
+
+    if os.getcwd() != cwd:
+        raise SystemExit("the process working directory changed")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,16 @@
 import asyncio
 import os
 
-import requests
 from typing_extensions import TypedDict
 
 from agents import Agent, Runner, SQLiteSession, function_tool
+from common import (
+    OPENWEATHER_URL,
+    close_http_client,
+    fetch_current_weather,
+    single_flight,
+    single_flight_stats,
+)
 from config import with_env
 
 
@@ -15,7 +21,9 @@ class Location(TypedDict):
 
 # I can ask the agent to pass certain values but the real control
 # over which values will be passed is limited
+# Identical calls made while one is running share its result
 @function_tool
+@single_flight
 async def fetch_weather(location: Location) -> str:
     print(f"fetching weather for {location}...")
 
@@ -23,20 +31,13 @@ async def fetch_weather(location: Location) -> str:
     if not weather_api_key:
         return "Error: OpenWeather API key not found in environment variables"
 
-    base_url = "https://api.openweathermap.org/data/2.5/weather"
-    params = {
-        "lat": location["lat"],
-        "lon": location["long"],
-        "appid": weather_api_key,
-        "units": "metric",
-    }
-
-    # Run the synchronous requests call in a thread pool
-    loop = asyncio.get_event_loop()
-    response = await loop.run_in_executor(None, requests.get, base_url, params)
-    response.raise_for_status()
+    # Point OPENWEATHER_URL at `python -m common.weather_stub` to test offline
+    base_url = os.environ.get("OPENWEATHER_URL", OPENWEATHER_URL)
 
-    data = response.json()
+    # Shared keep-alive client, nearby and repeated lookups come from the cache
+    data = await fetch_current_weather(
+        location["lat"], location["long"], weather_api_key, base_url
+    )
     weather_desc = data["weather"][0]["description"]
     temp = data["main"]["temp"]
     feels_like = data["main"]["feels_like"]
@@ -66,6 +67,8 @@ async def main():
         session=session,
     )
     print(result.final_output)
+    print(single_flight_stats())
+    await close_http_client()
 
 
 if __name__ == "__main__":
@@ -1,21 +1,44 @@
 import asyncio
-import os
 import sys
 from pathlib import Path
 
+from pydantic import BaseModel, Field
+
 from agents import (
     Agent,
     FunctionToolResult,
+    RunContextWrapper,
     Runner,
     SQLiteSession,
     ToolsToFinalOutputResult,
     function_tool,
 )
+from common import directory_cache, read_page, search_index
 from config import with_env
 
+MAX_SEARCH_HITS = 20
+
+
+class FileManagerContext(BaseModel):
+    """
+    Per-run state of the file manager. The current directory lives here and
+    not in the process (os.chdir), so several runs can share one process
+    without moving each other around. search_files only indexes directories
+    under `root`, the directory the run started in unless given.
+    """
+
+    cwd: Path = Field(default_factory=Path.cwd)
+    root: Path = Field(default_factory=Path.cwd)
+
+    def resolve(self, path: str) -> Path:
+        """`path` made absolute against this run's current directory."""
+        return (self.cwd / Path(path).expanduser()).resolve()
+
 
 @function_tool
-async def list_directory_files(directory_path: str = ".") -> str:
+async def list_directory_files(
+    wrapper: RunContextWrapper[FileManagerContext], directory_path: str = "."
+) -> str:
     """List files and directories in a given directory.
 
     Args:
@@ -26,39 +49,48 @@ async def list_directory_files(directory_path: str = ".") -> str:
     """
 
     try:
-        path = Path(directory_path)
+        path = wrapper.context.resolve(directory_path)
     except Exception as e:
         return f"error: invalid directory path: {repr(e)}"
 
-    if not path.exists():
+    # Cached until the directory changes, shared with search_files
+    try:
+        entries = directory_cache.listdir(path)
+    except FileNotFoundError:
         return f"error: directory {directory_path} does not exist"
-
-    if not path.is_dir():
+    except NotADirectoryError:
         return f"error: {directory_path} is not a directory"
+    except OSError as e:
+        return f"error: listing directory: {repr(e)}"
 
-    items = []
-    for item in sorted(path.iterdir()):
-        if item.is_dir():
-            items.append(f"directory: {item.name}/")
+    items = [f"directory: {entry.name}/" for entry in entries if entry.is_dir]
 
     if not items:
         return f"directory {directory_path} is empty"
 
-    return f"contents of directory {path.absolute()}:\n" + "\n".join(items)
+    return f"contents of directory {path}:\n" + "\n".join(items)
 
 
 @function_tool
-async def read_text_file(file_path: str) -> str:
-    """Read the content of a text file.
+async def read_text_file(
+    wrapper: RunContextWrapper[FileManagerContext],
+    file_path: str,
+    offset: int = 0,
+    line: int | None = None,
+) -> str:
+    """Read a page of a text file. Big files are read one page at a time, read
+    again from the offset given at the end of a page to continue.
 
     Args:
         file_path: Path to the file to read
+        offset: Byte offset to start reading at (default: start of the file)
+        line: Line number to start reading at, used instead of offset if given
 
     Returns:
-        File content
+        The page content with its byte and line range and the file size
     """
     try:
-        path = Path(file_path)
+        path = wrapper.context.resolve(file_path)
     except Exception as e:
         return f"error: invalid file path: {repr(e)}"
 
@@ -69,18 +101,61 @@ async def read_text_file(file_path: str) -> str:
         return f"error: {file_path} is not a file"
 
     try:
-        content = path.read_text(encoding="utf-8")
+        # Memory-mapped, only the requested window is loaded
+        page = await asyncio.to_thread(read_page, path, offset, line)
     except Exception as e:
         return f"error: reading file: {repr(e)}"
 
-    if not content.strip():
+    if not page.total_bytes:
         return f"error: file {file_path} is empty"
 
-    return f"content of file {file_path}:\n\n{content}"
+    return str(page)
+
+
+@function_tool
+async def search_files(
+    wrapper: RunContextWrapper[FileManagerContext],
+    text: str,
+    directory_path: str = ".",
+) -> str:
+    """Search all text files under a directory for lines containing some text.
+
+    Args:
+        text: Text to look for, matched case-insensitively
+        directory_path: Directory to search recursively (default: current directory)
+
+    Returns:
+        Matching lines as path:line: content, best matches first
+    """
+    path = wrapper.context.resolve(directory_path)
+    if not path.is_dir():
+        return f"error: {directory_path} is not a directory"
+    # Indexing reads every file, so not the whole disk or home directory
+    root = wrapper.context.root.resolve()
+    if not path.is_relative_to(root):
+        return f"error: can only search under {root}"
+
+    # The index is kept between calls, only files changed since are re-read
+    index = search_index(path)
+    stats = await asyncio.to_thread(index.refresh)
+    hits = await asyncio.to_thread(index.search, text, MAX_SEARCH_HITS)
+
+    # Too many files to index them all, the search missed some
+    partial = f" (only the first {stats.files} files)" if stats.truncated else ""
+    if not hits:
+        return (
+            f"no lines containing '{text}' in {stats.files} files under {path}"
+            + partial
+        )
+
+    lines = "\n".join(str(hit) for hit in hits)
+    return f"lines containing '{text}' under {index.root}{partial}:\n{lines}"
 
 
 @function_tool
-async def change_directory(directory_path: str) -> str:
+async def change_directory(
+    wrapper: RunContextWrapper[FileManagerContext], directory_path: str
+) -> str:
     """Change to another directory.
 
     Args:
@@ -90,7 +165,7 @@ async def change_directory(directory_path: str) -> str:
         Message about the directory change
     """
     try:
-        path = Path(directory_path)
+        path = wrapper.context.resolve(directory_path)
     except Exception as e:
         return f"error: invalid directory path: {repr(e)}"
 
@@ -100,9 +175,9 @@ async def change_directory(directory_path: str) -> str:
     if not path.is_dir():
         return f"error: {directory_path} is not a directory"
 
-    os.chdir(str(path.absolute()))
-    current_dir = Path.cwd()
-    return f"changed to directory: {current_dir}"
+    # Only this run moves, the process working directory stays where it is
+    wrapper.context.cwd = path
+    return f"changed to directory: {path}"
 
 
 def files_tool_use_behavior(
@@ -141,22 +216,24 @@ async def main():
 
     instructions = """
     You are a smart file manager assistant.
-    You can help users navigate the file system, read files, and change
-    between directories. Always be helpful and friendly in your responses."""
+    You can help users navigate the file system, search and read files, and
+    change between directories. Always be helpful and friendly in your
+    responses."""
 
     agent = Agent(
         name="File Manager",
         instructions=instructions,
-        tools=[list_directory_files, read_text_file, change_directory],
+        tools=[list_directory_files, search_files, read_text_file, change_directory],
         tool_use_behavior=files_tool_use_behavior,
     )
 
     search_query = f"""
     Search for a file that contains the text '{search_text}'.
-    First, list the files in the current directory, then read files to find one
-    containing this text. If needed, navigate to subdirectories to search thoroughly.
-    When you find a file containing the text, report which file it is and show the
-    relevant content.
+    First, use search_files to find the lines containing this text. If that
+    finds nothing useful, list the files in the current directory and read
+    files to find one containing this text, navigating to subdirectories if
+    needed. When you find a file containing the text, report which file it is
+    and show the relevant content.
     """
     session = SQLiteSession("files", "files.sql")
 
@@ -164,9 +241,11 @@ async def main():
         agent,
         search_query,
         session=session,
+        context=FileManagerContext(),
         max_turns=5,
     )
     print(result.final_output)
+    print(directory_cache.stats())
 
 
 if __name__ == "__main__":
@@ -1,12 +1,18 @@
 import asyncio
 import os
 
-import requests
 from pydantic import BaseModel
 from typing_extensions import TypedDict
 
 from agents import Agent, Runner, SQLiteSession, function_tool
 from agents.run_context import RunContextWrapper
+from common import (
+    OPENWEATHER_URL,
+    close_http_client,
+    fetch_current_weather,
+    single_flight,
+    single_flight_stats,
+)
 from config import with_env
 
 # Example 1:
@@ -24,25 +30,20 @@ class Location(TypedDict):
     long: float
 
 
+# Identical calls made while one is running share its result
 @function_tool
+@single_flight
 async def fetch_weather(
     wrapper: RunContextWrapper[AssistantContext],
     location: Location,
 ) -> str:
-    base_url = wrapper.context.weather_api_url
-    params = {
-        "lat": location["lat"],
-        "lon": location["long"],
-        "appid": wrapper.context.weather_api_key,
-        "units": "metric",
-    }
-
-    # Run the synchronous requests call in a thread pool
-    loop = asyncio.get_event_loop()
-    response = await loop.run_in_executor(None, requests.get, base_url, params)
-    response.raise_for_status()
-
-    data = response.json()
+    # Shared keep-alive client, nearby and repeated lookups come from the cache
+    data = await fetch_current_weather(
+        location["lat"],
+        location["long"],
+        wrapper.context.weather_api_key,
+        wrapper.context.weather_api_url,
+    )
     weather_desc = data["weather"][0]["description"]
     temp = data["main"]["temp"]
     feels_like = data["main"]["feels_like"]
@@ -66,7 +67,7 @@ async def main():
     session = SQLiteSession("weather", "weather.sql")
 
     ctx = AssistantContext(
-        weather_api_url="https://api.openweathermap.org/data/2.5/weather",
+        weather_api_url=os.environ.get("OPENWEATHER_URL", OPENWEATHER_URL),
         weather_api_key=os.environ.get("OPENWEATHER_API_KEY"),
     )
 
@@ -79,6 +80,8 @@ async def main():
     )
 
     print(result.final_output)
+    print(single_flight_stats())
+    await close_http_client()
 
 
 if __name__ == "__main__":
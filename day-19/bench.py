@@ -0,0 +1,72 @@
+"""
+Fan-out benchmark with scripted models whose latency has a long tail, like
+real model calls: starting only `quorum` candidates and waiting for all of
+them with asyncio.gather, as before, versus fan_out starting all candidates,
+returning at the quorum and cancelling the stragglers. Run it from this
+directory:
+
+    python bench.py --rounds 20 --candidates 5 --quorum 3
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from agents import Agent, Runner, set_tracing_disabled
+from common import ScriptedModel, fan_out
+
+
+def agents(rng: random.Random, n: int) -> list[Agent]:
+    # Mostly about half a second, sometimes several times that
+    return [
+        Agent(
+            name="spanish_agent",
+            model=ScriptedModel(
+                tokens=20, token_rate=200, latency=rng.lognormvariate(-1.2, 0.8)
+            ),
+        )
+        for _ in range(n)
+    ]
+
+
+async def gather_quorum(candidates: list[Agent], quorum: int) -> None:
+    await asyncio.gather(*(Runner.run(agent, "hola") for agent in candidates[:quorum]))
+
+
+async def with_quorum(candidates: list[Agent], quorum: int) -> None:
+    result = await fan_out(
+        lambda i: Runner.run(candidates[i], "hola"), len(candidates), quorum
+    )
+    assert len(result.values) >= quorum
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=5)
+    parser.add_argument("--quorum", type=int, default=3)
+    args = parser.parse_args()
+    set_tracing_disabled(True)
+
+    for name, run in [("gather", gather_quorum), ("fan_out", with_quorum)]:
+        # The same latencies for both
+        rng = random.Random(0)
+        times = []
+        for _ in range(args.rounds):
+            candidates = agents(rng, args.candidates)
+            started = time.perf_counter()
+            await run(candidates, args.quorum)
+            times.append(time.perf_counter() - started)
+
+        times.sort()
+        print(
+            f"{name:10} p50 {statistics.median(times) * 1000:6.0f}ms "
+            f"p95 {times[int(len(times) * 0.95)] * 1000:6.0f}ms "
+            f"({args.quorum} of {args.candidates})"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,11 +3,20 @@ import asyncio
 from langsmith.wrappers import OpenAIAgentsTracingProcessor
 
 from agents import Agent, Runner, set_trace_processors, trace
+from common import fan_out, pick_consensus
 from config import with_env
 
+CANDIDATES = 5
+# Pick from the first three translations, don't wait for the slowest. This
+# costs more tokens than running three: the two cancelled runs have usually
+# been sent and started generating, and are billed for that
+QUORUM = 3
+MAX_CONCURRENCY = 5
+CANDIDATE_TIMEOUT = 60.0
+
 """
-This example shows the parallelization pattern. We run the agent three times
-in parallel, and pick the best result.
+This example shows the parallelization pattern. We run the agent several times
+in parallel, and pick the best of the first results to arrive.
 
 Guardrails work behind the scenes via parallel agents - one processes user input
 while a shadow guardrail agent validates requests and stops the main agent on problems.
@@ -40,36 +49,39 @@ async def main():
 
     # Ensure the entire workflow is a single trace
     with trace("Day-19: Parallel Translation"):
-        results = await asyncio.gather(
-            Runner.run(
-                spanish_agent,
-                msg,
-            ),
-            Runner.run(
-                spanish_agent,
-                msg,
-            ),
-            Runner.run(
-                spanish_agent,
-                msg,
-            ),
+        results = await fan_out(
+            lambda _: Runner.run(spanish_agent, msg),
+            n=CANDIDATES,
+            quorum=QUORUM,
+            concurrency=MAX_CONCURRENCY,
+            timeout=CANDIDATE_TIMEOUT,
         )
+        print(f"Candidates:\n{results.latency_report()}\n")
+        if not results.values:
+            raise RuntimeError("no translation succeeded")
 
-        outputs = [result.final_output for result in results]
+        outputs = [result.final_output for result in results.values]
 
         translations = "\n\n".join(outputs)
         print(f"Translations:\n\n{translations}")
 
-        best_translation = await Runner.run(
-            translation_picker,
-            f"""
-            Input:\n{msg}
-            \n\n
-            Translations:\n{translations}
-            """,
-        )
-
-    print(best_translation.final_output)
+        # Similar translations agree on the medoid, no model call needed
+        consensus = pick_consensus(outputs)
+        print(f"Agreement: {consensus.agreement:.2f}\n")
+        if consensus.agreed:
+            best_translation = outputs[consensus.index]
+        else:
+            picked = await Runner.run(
+                translation_picker,
+                f"""
+                Input:\n{msg}
+                \n\n
+                Translations:\n{translations}
+                """,
+            )
+            best_translation = picked.final_output
+
+    print(best_translation)
 
 
 if __name__ == "__main__":